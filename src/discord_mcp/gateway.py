@@ -0,0 +1,167 @@
+"""Gateway intents and cache settings read from the environment."""
+
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import discord
+
+logger = logging.getLogger("discord-mcp-server")
+
+# Intents the server ran with before they became configurable
+LEGACY_INTENTS = ("message_content", "members", "guilds")
+
+def _names(spec: str) -> list:
+    return [name.strip().lower() for name in spec.split(",") if name.strip()]
+
+def _parse_bool(name: str, value: str) -> bool:
+    lowered = value.strip().lower()
+    if lowered in ("1", "true", "yes", "on"):
+        return True
+    if lowered in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"{name} must be true or false, not {value!r}")
+
+def intents_from_names(names: Iterable[str]) -> discord.Intents:
+    """Build Intents with exactly the named flags (plus ``guilds``, which discord.py's state needs)."""
+    intents = discord.Intents.none()
+    intents.guilds = True
+    for name in names:
+        if name not in discord.Intents.VALID_FLAGS:
+            raise ValueError(f"Unknown gateway intent: {name}")
+        setattr(intents, name, True)
+    return intents
+
+def parse_intents(spec: str) -> Optional[discord.Intents]:
+    """Parse DISCORD_INTENTS; returns None for ``auto``, resolved later from the enabled tools."""
+    lowered = spec.strip().lower()
+    if lowered == "auto":
+        return None
+    if lowered == "all":
+        return discord.Intents.all()
+    if lowered == "default":
+        return discord.Intents.default()
+    if lowered == "legacy":
+        return intents_from_names(LEGACY_INTENTS) | discord.Intents.default()
+    return intents_from_names(_names(spec))
+
+def parse_shard_ids(spec: str) -> List[int]:
+    """Parse DISCORD_SHARD_IDS: comma-separated shard IDs and ``first-last`` ranges."""
+    shard_ids: List[int] = []
+    for part in _names(spec):
+        first, _, last = part.partition("-")
+        shard_ids.extend(range(int(first), int(last or first) + 1))
+    return shard_ids
+
+def parse_member_cache_flags(spec: str) -> discord.MemberCacheFlags:
+    lowered = spec.strip().lower()
+    if lowered == "all":
+        return discord.MemberCacheFlags.all()
+    if lowered == "none":
+        return discord.MemberCacheFlags.none()
+    flags = discord.MemberCacheFlags.none()
+    for name in _names(spec):
+        if name not in discord.MemberCacheFlags.VALID_FLAGS:
+            raise ValueError(f"Unknown member cache flag: {name}")
+        setattr(flags, name, True)
+    return flags
+
+@dataclass
+class GatewayConfig:
+    """How the bot connects to the gateway and what discord.py keeps in memory.
+
+    ``intents`` is None for the ``auto`` profile until :meth:`resolve` is
+    called with the intents the enabled tools declared. ``member_cache_flags``
+    and ``chunk_guilds_at_startup`` are None to use discord.py's defaults for
+    the chosen intents. With ``sharded`` the client is an AutoShardedBot; a
+    ``shard_count`` of None uses Discord's recommended count, and
+    ``shard_ids`` of None runs every shard in this process.
+    """
+
+    intents: Optional[discord.Intents]
+    member_cache_flags: Optional[discord.MemberCacheFlags] = None
+    max_messages: Optional[int] = 1000
+    chunk_guilds_at_startup: Optional[bool] = None
+    sharded: bool = False
+    shard_count: Optional[int] = None
+    shard_ids: Optional[List[int]] = None
+
+    @property
+    def is_auto(self) -> bool:
+        return self.intents is None
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] = os.environ) -> "GatewayConfig":
+        config = cls(intents=parse_intents(env.get("DISCORD_INTENTS", "legacy")))
+        if env.get("DISCORD_MEMBER_CACHE_FLAGS"):
+            config.member_cache_flags = parse_member_cache_flags(env["DISCORD_MEMBER_CACHE_FLAGS"])
+        if env.get("DISCORD_MAX_MESSAGES"):
+            value = env["DISCORD_MAX_MESSAGES"].strip().lower()
+            # discord.py treats 0 as "use the default"; here it disables the cache
+            config.max_messages = None if value in ("0", "none") else int(value)
+        if env.get("DISCORD_CHUNK_GUILDS_AT_STARTUP"):
+            config.chunk_guilds_at_startup = _parse_bool(
+                "DISCORD_CHUNK_GUILDS_AT_STARTUP", env["DISCORD_CHUNK_GUILDS_AT_STARTUP"]
+            )
+        if env.get("DISCORD_SHARDED"):
+            config.sharded = _parse_bool("DISCORD_SHARDED", env["DISCORD_SHARDED"])
+        if env.get("DISCORD_SHARD_COUNT"):
+            config.shard_count = int(env["DISCORD_SHARD_COUNT"])
+        if env.get("DISCORD_SHARD_IDS"):
+            config.shard_ids = parse_shard_ids(env["DISCORD_SHARD_IDS"])
+        if config.shard_count is not None or config.shard_ids is not None:
+            config.sharded = True
+        if config.shard_ids is not None:
+            if config.shard_count is None:
+                raise ValueError("DISCORD_SHARD_IDS requires DISCORD_SHARD_COUNT")
+            invalid = [shard_id for shard_id in config.shard_ids if not 0 <= shard_id < config.shard_count]
+            if invalid:
+                raise ValueError(f"Shard IDs out of range for {config.shard_count} shards: {invalid}")
+        return config
+
+    def resolve(self, required: Iterable[str]) -> discord.Intents:
+        """Fix the ``auto`` profile to the intents in ``required``; a no-op for explicit profiles."""
+        if self.intents is None:
+            self.intents = intents_from_names(required)
+            enabled = [name for name, on in self.intents if on]
+            logger.info(f"Gateway intents derived from enabled tools: {', '.join(enabled)}")
+        return self.intents
+
+    def fit_to_intents(self) -> None:
+        """Drop cache settings the resolved intents cannot support, instead of failing at login."""
+        if not self.intents.members:
+            if self.member_cache_flags is not None and self.member_cache_flags.joined:
+                logger.warning("Members intent disabled; ignoring the 'joined' member cache flag")
+                self.member_cache_flags.joined = False
+            if self.chunk_guilds_at_startup:
+                logger.warning("Members intent disabled; guilds will not be chunked at startup")
+            self.chunk_guilds_at_startup = False
+        if not self.intents.voice_states and self.member_cache_flags is not None and self.member_cache_flags.voice:
+            logger.warning("Voice states intent disabled; ignoring the 'voice' member cache flag")
+            self.member_cache_flags.voice = False
+
+    def client_options(self) -> Dict[str, Any]:
+        """Keyword arguments for the discord.py client constructor."""
+        self.fit_to_intents()
+        options: Dict[str, Any] = {"intents": self.intents, "max_messages": self.max_messages}
+        if self.member_cache_flags is not None:
+            options["member_cache_flags"] = self.member_cache_flags
+        if self.chunk_guilds_at_startup is not None:
+            options["chunk_guilds_at_startup"] = self.chunk_guilds_at_startup
+        if self.sharded:
+            options["shard_count"] = self.shard_count
+            options["shard_ids"] = self.shard_ids
+        return options
+
+    def snapshot(self) -> Dict[str, Any]:
+        flags = self.member_cache_flags
+        return {
+            "intents": [name for name, on in self.intents if on] if self.intents is not None else "auto",
+            "member_cache_flags": [name for name, on in flags if on] if flags is not None else "default",
+            "max_messages": self.max_messages,
+            "chunk_guilds_at_startup": self.chunk_guilds_at_startup,
+            "sharded": self.sharded,
+            "shard_count": self.shard_count,
+            "shard_ids": self.shard_ids,
+        }
@@ -0,0 +1,411 @@
+"""In-memory member index fed by gateway chunking and member events."""
+
+import bisect
+import difflib
+import itertools
+import logging
+import sys
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import discord
+
+logger = logging.getLogger("discord-mcp-server")
+
+# Shared by every member without roles, so role-less members cost no array
+NO_ROLES: Sequence[int] = ()
+
+def _role_array(role_ids: Iterable[int]) -> Sequence[int]:
+    roles = array("Q", role_ids)
+    return roles if roles else NO_ROLES
+
+class MemberRecord:
+    """The member fields the tools report, in a compact slotted record.
+
+    Role IDs are packed into an unsigned 64-bit ``array`` (or the shared
+    empty tuple) and the join time is kept as a POSIX timestamp, so a
+    record holds no per-member dict, datetime or int objects.
+    """
+
+    __slots__ = ("id", "name", "nick", "global_name", "_joined", "roles")
+
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        nick: Optional[str],
+        global_name: Optional[str],
+        joined_at: Optional[datetime],
+        roles: Iterable[int],
+    ):
+        self.id = id
+        self.name = name
+        self.nick = nick
+        self.global_name = global_name
+        self._joined = joined_at.timestamp() if joined_at is not None else None
+        self.roles = _role_array(roles)
+
+    @property
+    def joined_at(self) -> Optional[datetime]:
+        return datetime.fromtimestamp(self._joined, timezone.utc) if self._joined is not None else None
+
+    @classmethod
+    def from_member(cls, member: discord.Member) -> "MemberRecord":
+        return cls(
+            id=member.id,
+            name=member.name,
+            nick=member.nick,
+            global_name=member.global_name,
+            joined_at=member.joined_at,
+            roles=(role.id for role in member.roles[1:]),  # Skip @everyone
+        )
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> "MemberRecord":
+        """Build a record from a raw GUILD_MEMBER_* gateway payload."""
+        user = data["user"]
+        return cls(
+            id=int(user["id"]),
+            name=user["username"],
+            nick=data.get("nick"),
+            global_name=user.get("global_name"),
+            joined_at=discord.utils.parse_time(data.get("joined_at")),
+            roles=(int(role_id) for role_id in data.get("roles", ())),
+        )
+
+    def name_keys(self) -> Set[str]:
+        """Casefolded username, nickname and global name, for the name index."""
+        return {value.casefold() for value in (self.name, self.nick, self.global_name) if value}
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by this record, including its strings and role array."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.name)
+        if self.nick is not None:
+            size += sys.getsizeof(self.nick)
+        if self.global_name is not None:
+            size += sys.getsizeof(self.global_name)
+        if self.roles is not NO_ROLES:
+            size += sys.getsizeof(self.roles)
+        return size
+
+    def matches(
+        self,
+        role_id: Optional[int] = None,
+        joined_after: Optional[datetime] = None,
+        prefix: Optional[str] = None,
+    ) -> bool:
+        """Check list filters; ``prefix`` must already be casefolded."""
+        if role_id is not None and role_id not in self.roles:
+            return False
+        if joined_after is not None and (self._joined is None or self._joined <= joined_after.timestamp()):
+            return False
+        if prefix is not None:
+            return any(
+                value is not None and value.casefold().startswith(prefix)
+                for value in (self.name, self.nick, self.global_name)
+            )
+        return True
+
+class GuildMembers:
+    """Members of one guild, iterable in user-ID order, with a role -> member-ID index."""
+
+    def __init__(self, guild_id: int, records: Iterable[MemberRecord] = ()):
+        self.guild_id = guild_id
+        self.last_used = time.monotonic()
+        self.by_id: Dict[int, MemberRecord] = {record.id: record for record in records}
+        self._ids: List[int] = sorted(self.by_id)
+        self.role_members: Dict[int, Set[int]] = {}
+        for record in self.by_id.values():
+            self._index_roles(record.id, record.roles)
+        # Sorted (casefolded name, user ID) pairs; built on the first find()
+        self._names: Optional[List[Tuple[str, int]]] = None
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def _index_roles(self, user_id: int, roles: Iterable[int]) -> None:
+        for role_id in roles:
+            self.role_members.setdefault(role_id, set()).add(user_id)
+
+    def _unindex_roles(self, user_id: int, roles: Iterable[int]) -> None:
+        for role_id in roles:
+            members = self.role_members.get(role_id)
+            if members is not None:
+                members.discard(user_id)
+                if not members:
+                    del self.role_members[role_id]
+
+    def _index_names(self, user_id: int, keys: Iterable[str]) -> None:
+        if self._names is not None:
+            for key in keys:
+                bisect.insort(self._names, (key, user_id))
+
+    def _unindex_names(self, user_id: int, keys: Iterable[str]) -> None:
+        if self._names is not None:
+            for key in keys:
+                i = bisect.bisect_left(self._names, (key, user_id))
+                if i < len(self._names) and self._names[i] == (key, user_id):
+                    del self._names[i]
+
+    def upsert(self, record: MemberRecord) -> None:
+        previous = self.by_id.get(record.id)
+        if previous is None:
+            bisect.insort(self._ids, record.id)
+            self._index_roles(record.id, record.roles)
+            self._index_names(record.id, record.name_keys())
+        else:
+            if list(previous.roles) != list(record.roles):
+                old, new = set(previous.roles), set(record.roles)
+                self._unindex_roles(record.id, old - new)
+                self._index_roles(record.id, new - old)
+            self.rename(previous, record.name, record.nick, record.global_name)
+        self.by_id[record.id] = record
+
+    def rename(self, record: MemberRecord, name: str, nick: Optional[str], global_name: Optional[str]) -> None:
+        """Update a record's names, keeping the name index in step."""
+        old = record.name_keys()
+        record.name, record.nick, record.global_name = name, nick, global_name
+        new = record.name_keys()
+        if old != new:
+            self._unindex_names(record.id, old - new)
+            self._index_names(record.id, new - old)
+
+    def remove(self, user_id: int) -> None:
+        record = self.by_id.pop(user_id, None)
+        if record is not None:
+            del self._ids[bisect.bisect_left(self._ids, user_id)]
+            self._unindex_roles(user_id, record.roles)
+            self._unindex_names(user_id, record.name_keys())
+
+    def find(self, query: str, limit: int = 10, fuzzy: bool = False) -> List[Tuple[MemberRecord, str]]:
+        """Members whose username, nickname or global name matches ``query``, best first.
+
+        Returns (record, match) pairs where match is "exact" or "prefix", and
+        with ``fuzzy`` also "substring" or "similar" (close spelling with the
+        same first letter). Prefix matches come straight off the sorted name
+        index; the fuzzy passes scan names and only run when prefix matches
+        fall short.
+        """
+        if self._names is None:
+            self._names = sorted((key, record.id) for record in self.by_id.values() for key in record.name_keys())
+        names = self._names
+        q = query.casefold()
+        found: Dict[int, str] = {}
+        # Index from the bisect position; islice would step over every earlier name
+        for i in range(bisect.bisect_left(names, (q,)), len(names)):
+            key, user_id = names[i]
+            if len(found) >= limit or not key.startswith(q):
+                break
+            found.setdefault(user_id, "exact" if key == q else "prefix")
+        if fuzzy and len(found) < limit:
+            for key, user_id in names:
+                if q in key and user_id not in found:
+                    found[user_id] = "substring"
+                    if len(found) >= limit:
+                        break
+        if fuzzy and len(found) < limit:
+            # Assume the first letter is right, to keep the comparison set small
+            lo = bisect.bisect_left(names, (q[0],))
+            hi = bisect.bisect_left(names, (chr(ord(q[0]) + 1),))
+            keys: Dict[str, List[int]] = {}
+            for key, user_id in names[lo:hi]:
+                keys.setdefault(key, []).append(user_id)
+            for key in difflib.get_close_matches(q, keys, n=limit, cutoff=0.7):
+                for user_id in keys[key]:
+                    found.setdefault(user_id, "similar")
+        return [(self.by_id[user_id], match) for user_id, match in itertools.islice(found.items(), limit)]
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the records and the lookup structures."""
+        size = sys.getsizeof(self.by_id) + sys.getsizeof(self._ids) + sys.getsizeof(self.role_members)
+        size += sum(record.memory_bytes() for record in self.by_id.values())
+        size += sum(sys.getsizeof(members) for members in self.role_members.values())
+        if self._names is not None:
+            size += sys.getsizeof(self._names)
+            size += sum(sys.getsizeof(pair) + sys.getsizeof(pair[0]) for pair in self._names)
+        return size
+
+    def drop_role(self, role_id: int) -> None:
+        """Forget a deleted role; Discord sends no member updates for it."""
+        for user_id in self.role_members.pop(role_id, ()):
+            record = self.by_id[user_id]
+            record.roles = _role_array(r for r in record.roles if r != role_id)
+
+    def with_roles(
+        self,
+        all_of: Iterable[int] = (),
+        any_of: Iterable[int] = (),
+        none_of: Iterable[int] = (),
+    ) -> Set[int]:
+        """Member IDs holding every role in ``all_of``, at least one of ``any_of`` and none of ``none_of``."""
+        empty: Set[int] = set()
+        all_of, any_of = list(all_of), list(any_of)
+        if all_of:
+            # Intersect starting from the smallest set
+            sets = sorted((self.role_members.get(r, empty) for r in all_of), key=len)
+            result = set(sets[0]).intersection(*sets[1:])
+        else:
+            result = None
+        if any_of:
+            union = set().union(*(self.role_members.get(r, empty) for r in any_of))
+            result = union if result is None else result & union
+        if result is None:
+            result = set(self.by_id)
+        for role_id in none_of:
+            result -= self.role_members.get(role_id, empty)
+        return result
+
+    def __iter__(self) -> Iterator[MemberRecord]:
+        return self.iter_after(None)
+
+    def iter_after(self, after: Optional[int]) -> Iterator[MemberRecord]:
+        """Records with user ID greater than ``after``, in ID order."""
+        by_id = self.by_id
+        start = 0 if after is None else bisect.bisect_right(self._ids, after)
+        # Not safe across awaits: consume synchronously, as query() does
+        ids = self._ids
+        return (by_id[ids[i]] for i in range(start, len(ids)))
+
+    def query(
+        self,
+        *,
+        after: Optional[int] = None,
+        role_id: Optional[int] = None,
+        joined_after: Optional[datetime] = None,
+        name_prefix: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[MemberRecord]:
+        """Members after the ``after`` user ID matching every given filter, in user-ID order."""
+        prefix = name_prefix.casefold() if name_prefix else None
+        results: List[MemberRecord] = []
+        if role_id is not None:
+            # Walk only the role's members rather than the whole guild
+            holders = sorted(i for i in self.role_members.get(role_id, ()) if after is None or i > after)
+            candidates: Iterable[MemberRecord] = (self.by_id[i] for i in holders)
+        else:
+            candidates = self.iter_after(after)
+        for record in candidates:
+            if not record.matches(role_id, joined_after, prefix):
+                continue
+            results.append(record)
+            if len(results) >= limit:
+                break
+        return results
+
+# A member event, replayed against a guild's index
+MemberChange = Callable[["GuildMembers"], None]
+
+class MemberIndex:
+    """Per-guild member records for every guild whose member list has been loaded.
+
+    A guild is only present once its full member list has been loaded
+    (from gateway chunking); until then callers should fall back to REST.
+    ``get`` marks a guild as used, for :meth:`evict_idle`.
+
+    Chunking takes a while on large guilds, and member events that arrive
+    meanwhile would find no index. :meth:`begin_load` opens a buffer for
+    them, and :meth:`load` replays it over the chunked list, so the index
+    is as current as the events it missed.
+    """
+
+    def __init__(self):
+        self.guilds: Dict[int, GuildMembers] = {}
+        self._loading: Dict[int, List[List[MemberChange]]] = {}
+
+    def get(self, guild_id: int) -> Optional[GuildMembers]:
+        index = self.guilds.get(guild_id)
+        if index is not None:
+            index.last_used = time.monotonic()
+        return index
+
+    def begin_load(self, guild_id: int) -> List[MemberChange]:
+        """Start buffering the guild's member events; pass the buffer to :meth:`load`."""
+        pending: List[MemberChange] = []
+        self._loading.setdefault(guild_id, []).append(pending)
+        return pending
+
+    def end_load(self, guild_id: int, pending: List[MemberChange]) -> None:
+        """Stop buffering into ``pending`` (a load that failed or finished)."""
+        buffers = self._loading.get(guild_id, [])
+        if any(buffer is pending for buffer in buffers):
+            buffers[:] = [buffer for buffer in buffers if buffer is not pending]
+            if not buffers:
+                del self._loading[guild_id]
+
+    def load(
+        self, guild_id: int, members: Iterable[discord.Member], pending: Optional[List[MemberChange]] = None
+    ) -> GuildMembers:
+        index = GuildMembers(guild_id, (MemberRecord.from_member(member) for member in members))
+        if pending is not None:
+            self.end_load(guild_id, pending)
+            # Events seen while chunking are at least as new as the chunked list
+            for change in pending:
+                change(index)
+        self.guilds[guild_id] = index
+        logger.info(f"Indexed {len(index)} members of guild {guild_id}" + (f" ({len(pending)} events replayed)" if pending else ""))
+        return index
+
+    def _apply(self, guild_id: int, change: MemberChange) -> None:
+        index = self.guilds.get(guild_id)
+        if index is not None:
+            change(index)
+        for pending in self._loading.get(guild_id, ()):
+            pending.append(change)
+
+    def drop(self, guild_id: int) -> None:
+        self.guilds.pop(guild_id, None)
+
+    def reset(self) -> None:
+        """Forget every loaded guild, for when member events may have been missed."""
+        if self.guilds:
+            logger.info(f"Dropping member index of {len(self.guilds)} guilds")
+        self.guilds.clear()
+
+    def evict_idle(self, max_idle: float) -> List[int]:
+        """Drop guilds no caller has read for ``max_idle`` seconds; returns their IDs."""
+        cutoff = time.monotonic() - max_idle
+        evicted = [guild_id for guild_id, index in self.guilds.items() if index.last_used < cutoff]
+        for guild_id in evicted:
+            del self.guilds[guild_id]
+        if evicted:
+            logger.info(f"Evicted member index of {len(evicted)} idle guilds")
+        return evicted
+
+    def upsert(self, member: discord.Member) -> None:
+        record = MemberRecord.from_member(member)
+        self._apply(member.guild.id, lambda index: index.upsert(record))
+
+    def remove(self, guild_id: int, user_id: int) -> None:
+        self._apply(guild_id, lambda index: index.remove(user_id))
+
+    def drop_role(self, guild_id: int, role_id: int) -> None:
+        self._apply(guild_id, lambda index: index.drop_role(role_id))
+
+    def apply_raw_update(self, data: Dict[str, Any]) -> None:
+        """Apply a raw GUILD_MEMBER_UPDATE payload (used when discord.py keeps no member cache)."""
+        guild_id = int(data["guild_id"])
+        if guild_id in self.guilds or guild_id in self._loading:
+            record = MemberRecord.from_data(data)
+            self._apply(guild_id, lambda index: index.upsert(record))
+
+    def snapshot(self) -> Dict[str, Any]:
+        members = sum(len(index) for index in self.guilds.values())
+        size = sum(index.memory_bytes() for index in self.guilds.values())
+        return {
+            "guilds": len(self.guilds),
+            "members": members,
+            "bytes": size,
+            "bytes_per_member": round(size / members, 1) if members else None,
+        }
+
+    def update_user(self, user: discord.User) -> None:
+        """Apply a username/display-name change to every guild the user is indexed in."""
+        def rename(index: GuildMembers) -> None:
+            record = index.by_id.get(user.id)
+            if record is not None:
+                index.rename(record, user.name, record.nick, user.global_name)
+
+        for guild_id in self.guilds.keys() | self._loading.keys():
+            self._apply(guild_id, rename)
@@ -0,0 +1,244 @@
+"""Proactive scheduling of Discord REST requests against known rate-limit buckets."""
+
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+import aiohttp
+from discord.http import HTTPClient, Route
+
+logger = logging.getLogger("discord-mcp-server")
+
+class Bucket:
+    """Rate-limit state for one Discord bucket (bucket hash + major parameters).
+
+    ``limit`` is None when Discord reported no rate-limit headers for the
+    route. ``remaining`` already accounts for requests dispatched but not yet
+    answered.
+    """
+
+    __slots__ = ("key", "limit", "remaining", "reset_at", "in_flight", "lock", "updated", "last_used")
+
+    def __init__(self, key: str):
+        self.key = key
+        # Until Discord tells us the real limit, probe with one request at a time
+        self.limit: Optional[int] = 1
+        self.remaining = 1
+        self.reset_at: Optional[float] = None
+        self.in_flight = 0
+        self.lock = asyncio.Lock()
+        self.updated = asyncio.Event()
+        self.last_used = time.monotonic()
+
+    def is_idle(self, now: float) -> bool:
+        return (
+            self.in_flight == 0
+            and not self.lock.locked()
+            and (self.reset_at is None or self.reset_at <= now)
+            and now - self.last_used > 60
+        )
+
+class _Dispatch:
+    """A request that has been admitted by the scheduler and not yet answered."""
+
+    __slots__ = ("route", "bucket", "answered")
+
+    def __init__(self, route: Route, bucket: Bucket):
+        self.route = route
+        self.bucket = bucket
+        self.answered = False
+
+# Set for the duration of each admitted request so the aiohttp trace hook
+# (which runs in the requesting task) can attribute response headers
+_current_dispatch: ContextVar[Optional[_Dispatch]] = ContextVar("discord_mcp_dispatch", default=None)
+
+class RateLimitScheduler:
+    """Queue REST requests per bucket and release each one as soon as its bucket allows.
+
+    Bucket limits, remaining counts and reset times are learned from the
+    ``X-RateLimit-*`` response headers. Requests for a bucket are admitted in
+    FIFO order, and a global token bucket keeps the process under Discord's
+    per-bot global request rate. discord.py still applies its own 429
+    handling underneath, so a misprediction costs a retry, not a failure.
+    """
+
+    # Seconds to wait for a probe request to report headers before giving up on it
+    PROBE_TIMEOUT = 10.0
+    MAX_IDLE_BUCKETS = 1024
+
+    def __init__(self, global_rate: float = 50.0):
+        self.global_rate = global_rate
+        self._tokens = global_rate
+        self._refilled_at = time.monotonic()
+        self._global_paused_until = 0.0
+        self._route_hashes: Dict[str, str] = {}
+        self._buckets: Dict[str, Bucket] = {}
+        self.requests = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+        self.bucket_429s = 0
+        self.global_429s = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """aiohttp trace config to pass to the client as ``http_trace``."""
+        config = aiohttp.TraceConfig()
+        config.on_request_end.append(self._on_request_end)
+        return config
+
+    def install(self, http: HTTPClient) -> None:
+        """Route every request made through ``http`` via this scheduler."""
+        original = http.request
+
+        async def request(route: Route, **kwargs: Any) -> Any:
+            dispatch = await self.acquire(route)
+            token = _current_dispatch.set(dispatch)
+            try:
+                return await original(route, **kwargs)
+            finally:
+                _current_dispatch.reset(token)
+                self._release(dispatch)
+
+        http.request = request
+
+    def bucket_key(self, route: Route) -> str:
+        bucket_hash = self._route_hashes.get(route.key, route.key)
+        return f"{bucket_hash}:{route.major_parameters}"
+
+    def bucket_for(self, route: Route) -> Bucket:
+        key = self.bucket_key(route)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_IDLE_BUCKETS:
+                self._prune()
+            bucket = self._buckets[key] = Bucket(key)
+        return bucket
+
+    async def acquire(self, route: Route) -> _Dispatch:
+        """Wait until ``route`` may be sent, then reserve a slot in its bucket."""
+        bucket = self.bucket_for(route)
+        started = time.monotonic()
+        async with bucket.lock:
+            while True:
+                now = time.monotonic()
+                if bucket.limit is None:
+                    break
+                if bucket.reset_at is not None and now >= bucket.reset_at:
+                    bucket.remaining = max(bucket.limit - bucket.in_flight, 0)
+                    bucket.reset_at = None
+                if bucket.remaining > 0:
+                    bucket.remaining -= 1
+                    break
+                if bucket.reset_at is not None:
+                    await asyncio.sleep(bucket.reset_at - now)
+                else:
+                    # Exhausted with no known reset: wait for an outstanding response
+                    bucket.updated.clear()
+                    try:
+                        await asyncio.wait_for(bucket.updated.wait(), timeout=self.PROBE_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        bucket.remaining = max(bucket.remaining, 1)
+            # Only a request its bucket has admitted spends a global token
+            await self._acquire_global()
+            bucket.in_flight += 1
+            bucket.last_used = time.monotonic()
+        waited = bucket.last_used - started
+        self.requests += 1
+        if waited > 0.001:
+            self.delayed += 1
+            self.wait_seconds += waited
+        return _Dispatch(route, bucket)
+
+    async def _acquire_global(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._global_paused_until:
+                await asyncio.sleep(self._global_paused_until - now)
+                continue
+            self._tokens = min(self.global_rate, self._tokens + (now - self._refilled_at) * self.global_rate)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.global_rate)
+
+    def _release(self, dispatch: _Dispatch) -> None:
+        if not dispatch.answered:
+            # Failed before any response: give the reserved slot back
+            dispatch.answered = True
+            bucket = dispatch.bucket
+            bucket.in_flight -= 1
+            if bucket.limit is not None:
+                bucket.remaining = min(bucket.remaining + 1, bucket.limit)
+            bucket.updated.set()
+
+    async def _on_request_end(self, session: aiohttp.ClientSession, ctx: Any, params: aiohttp.TraceRequestEndParams) -> None:
+        dispatch = _current_dispatch.get()
+        if dispatch is None:
+            return
+        self.observe(dispatch, params.response.status, params.response.headers)
+
+    def observe(self, dispatch: _Dispatch, status: int, headers: Any) -> None:
+        """Update bucket state from one response to ``dispatch``."""
+        now = time.monotonic()
+        bucket = dispatch.bucket
+        if not dispatch.answered:
+            dispatch.answered = True
+            bucket.in_flight -= 1
+
+        if status == 429:
+            retry_after = float(headers.get("Retry-After", 1))
+            if headers.get("X-RateLimit-Global") == "true":
+                self.global_429s += 1
+                self._global_paused_until = now + retry_after
+                logger.warning(f"Global rate limit hit, pausing requests for {retry_after:.2f}s")
+            else:
+                self.bucket_429s += 1
+                logger.warning(f"Rate limit hit on bucket {bucket.key}, retry after {retry_after:.2f}s")
+                if bucket.limit is not None:
+                    bucket.remaining = 0
+                    bucket.reset_at = now + retry_after
+            # discord.py retries the request itself, inside the same dispatch
+            dispatch.answered = False
+            bucket.in_flight += 1
+            bucket.updated.set()
+            return
+
+        discord_hash = headers.get("X-RateLimit-Bucket")
+        if discord_hash is not None and dispatch.route.key not in self._route_hashes:
+            self._route_hashes[dispatch.route.key] = discord_hash
+            self._buckets.setdefault(f"{discord_hash}:{dispatch.route.major_parameters}", bucket)
+
+        if "X-RateLimit-Remaining" in headers:
+            bucket.limit = int(headers.get("X-RateLimit-Limit", 1))
+            bucket.remaining = max(int(headers["X-RateLimit-Remaining"]) - bucket.in_flight, 0)
+            reset_after = headers.get("X-RateLimit-Reset-After")
+            if reset_after is not None:
+                bucket.reset_at = now + float(reset_after)
+        else:
+            bucket.limit = None
+        bucket.updated.set()
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_idle(now)]:
+            del self._buckets[key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        # Routes that share a Discord bucket hash alias the same Bucket object
+        buckets = {id(b): b for b in self._buckets.values()}.values()
+        return {
+            "requests": self.requests,
+            "delayed": self.delayed,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "bucket_429s": self.bucket_429s,
+            "global_429s": self.global_429s,
+            "buckets": len(buckets),
+            "exhausted_buckets": sum(
+                1 for b in buckets
+                if b.limit is not None and b.remaining == 0 and b.reset_at is not None and b.reset_at > now
+            ),
+            "global_paused_for": round(max(self._global_paused_until - now, 0.0), 3),
+        }
@@ -0,0 +1,106 @@
+"""Startup readiness tracking and admission control for tool calls."""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("discord-mcp-server")
+
+# Startup phases in order: process started, REST login done, gateway
+# connected, guild cache filled (on_ready)
+PHASES = ("starting", "logged_in", "connected", "ready")
+
+class Readiness:
+    """Track Discord startup phases and hold tool calls until the client is ready.
+
+    Calls that arrive before the ``ready`` phase wait up to ``timeout``
+    seconds. At most ``max_waiters`` calls may wait at once; callers beyond
+    that are rejected immediately rather than queued without bound.
+    """
+
+    def __init__(self, timeout: float = 30.0, max_waiters: int = 100):
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.phase = "starting"
+        self.error: Optional[BaseException] = None
+        self.waiting = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._started = time.monotonic()
+        self._reached: Dict[str, datetime] = {"starting": datetime.now(timezone.utc)}
+        self._reached_after: Dict[str, float] = {"starting": 0.0}
+        self._ready: Optional[asyncio.Event] = None
+
+    @property
+    def event(self) -> asyncio.Event:
+        # Created lazily so it binds to the running loop, not the import-time one
+        if self._ready is None:
+            self._ready = asyncio.Event()
+        return self._ready
+
+    def is_ready(self) -> bool:
+        return self.phase == "ready"
+
+    def advance(self, phase: str) -> None:
+        """Record that startup reached ``phase``."""
+        if phase not in PHASES:
+            raise ValueError(f"Unknown readiness phase: {phase}")
+        if phase not in self._reached:
+            self._reached[phase] = datetime.now(timezone.utc)
+            self._reached_after[phase] = time.monotonic() - self._started
+            logger.info(f"Discord client phase '{phase}' after {self._reached_after[phase]:.2f}s")
+        # Never move backwards; reconnects re-fire connect/ready events
+        if PHASES.index(phase) > PHASES.index(self.phase):
+            self.phase = phase
+        if phase == "ready":
+            self.event.set()
+
+    def fail(self, error: BaseException) -> None:
+        """Mark startup as failed so queued and future calls error out at once."""
+        self.error = error
+        logger.error(f"Discord client failed to start: {error}")
+        self.event.set()
+
+    async def wait(self) -> None:
+        """Return once the client is ready; raise RuntimeError on timeout, overflow or failure."""
+        if self.error is not None:
+            raise RuntimeError(f"Discord client failed to start: {self.error}")
+        if self.is_ready():
+            return
+        if self.waiting >= self.max_waiters:
+            self.rejected += 1
+            raise RuntimeError(
+                f"Discord client not ready (phase: {self.phase}); {self.waiting} calls already waiting"
+            )
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise RuntimeError(
+                f"Discord client not ready after {self.timeout:g}s (phase: {self.phase})"
+            ) from None
+        finally:
+            self.waiting -= 1
+        if self.error is not None:
+            raise RuntimeError(f"Discord client failed to start: {self.error}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "phase": self.phase,
+            "error": str(self.error) if self.error else None,
+            "phases": {
+                phase: {
+                    "at": self._reached[phase].isoformat(),
+                    "after_seconds": round(self._reached_after[phase], 3),
+                }
+                for phase in PHASES if phase in self._reached
+            },
+            "waiting": self.waiting,
+            "max_waiters": self.max_waiters,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "ready_timeout": self.timeout,
+        }
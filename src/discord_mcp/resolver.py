@@ -0,0 +1,149 @@
+"""Cache-first resolution of Discord entities for tool handlers."""
+
+import asyncio
+import logging
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+import discord
+
+from .shards import shard_for
+
+logger = logging.getLogger("discord-mcp-server")
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key onto one in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it is
+    pending await the same task. Nothing is cached once the task finishes.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Run ``factory`` for ``key`` unless already running; returns (result, shared)."""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        # Shield so one cancelled caller does not cancel the fetch for the others
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved even if every waiter went away
+
+class EntityResolver:
+    """Look up channels, guilds and members in the gateway cache before using REST.
+
+    Cache misses are fetched over REST with concurrent identical fetches
+    coalesced. Every lookup is counted by entity kind and source ("cache",
+    "rest", or "coalesced" for callers that joined an in-flight fetch) so the
+    hit rate can be inspected at runtime.
+
+    Users outside the gateway cache are also kept for ``user_ttl`` seconds
+    (at most ``max_users`` of them), since user records rarely change.
+    """
+
+    def __init__(self, client: discord.Client, user_ttl: float = 3600.0, max_users: int = 10000):
+        self.client = client
+        self.stats: Counter = Counter()
+        self.flights = SingleFlight()
+        self.user_ttl = user_ttl
+        self.max_users = max_users
+        self._users: "OrderedDict[int, Tuple[float, discord.User]]" = OrderedDict()
+
+    def _record(self, kind: str, source: str, entity_id: int) -> None:
+        self.stats[(kind, source)] += 1
+        logger.debug(f"Resolved {kind} {entity_id} from {source}")
+
+    async def _fetch(self, route: Tuple[Hashable, ...], entity_id: int, factory: Callable[[], Awaitable[T]]) -> T:
+        result, shared = await self.flights.do(route, factory)
+        self._record(route[0], "coalesced" if shared else "rest", entity_id)
+        return result
+
+    async def channel(self, channel_id: int):
+        """Return a guild channel, thread or DM channel by ID."""
+        channel = self.client.get_channel(channel_id)
+        if channel is not None:
+            self._record("channel", "cache", channel_id)
+            return channel
+        return await self._fetch(("channel", channel_id), channel_id, lambda: self.client.fetch_channel(channel_id))
+
+    def shard_for(self, guild_id: int) -> Optional[int]:
+        """The shard whose gateway session carries ``guild_id``, or None when not sharded."""
+        if not isinstance(self.client, discord.AutoShardedClient) or not self.client.shard_count:
+            return None
+        return shard_for(guild_id, self.client.shard_count)
+
+    async def guild(self, guild_id: int) -> discord.Guild:
+        """Return a guild by ID.
+
+        When sharded, a guild on a shard this process does not run is
+        refused instead of fetched: REST would return it without channels,
+        members or roles, and its events never reach this process.
+        """
+        guild = self.client.get_guild(guild_id)
+        if guild is not None:
+            self._record("guild", "cache", guild_id)
+            return guild
+        shard_id = self.shard_for(guild_id)
+        if shard_id is not None and self.client.shard_ids is not None and shard_id not in self.client.shard_ids:
+            raise ValueError(f"Guild {guild_id} is on shard {shard_id}, which this process does not run")
+        return await self._fetch(("guild", guild_id), guild_id, lambda: self.client.fetch_guild(guild_id))
+
+    async def member(self, guild: discord.Guild, user_id: int) -> discord.Member:
+        """Return a member of ``guild`` by user ID."""
+        member = guild.get_member(user_id)
+        if member is not None:
+            self._record("member", "cache", user_id)
+            return member
+        return await self._fetch(("member", guild.id, user_id), user_id, lambda: guild.fetch_member(user_id))
+
+    async def user(self, user_id: int) -> discord.User:
+        """Return a user by ID from the gateway cache, the TTL cache, or REST."""
+        user = self.client.get_user(user_id)
+        if user is not None:
+            self._record("user", "cache", user_id)
+            return user
+        cached = self._users.get(user_id)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self._users.move_to_end(user_id)
+                self._record("user", "cache", user_id)
+                return cached[1]
+            del self._users[user_id]
+        user = await self._fetch(("user", user_id), user_id, lambda: self.client.fetch_user(user_id))
+        if self.user_ttl > 0:
+            self._users[user_id] = (time.monotonic() + self.user_ttl, user)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return user
+
+    async def message(self, channel: discord.abc.Messageable, message_id: int) -> discord.Message:
+        """Fetch a message by ID, sharing the request with concurrent callers."""
+        return await self._fetch(("message", channel.id, message_id), message_id, lambda: channel.fetch_message(message_id))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-kind lookup counts by source and the share not sent to REST."""
+        result: Dict[str, Dict[str, Any]] = {}
+        for (kind, source), count in self.stats.items():
+            result.setdefault(kind, {"cache": 0, "rest": 0, "coalesced": 0})[source] = count
+        for counts in result.values():
+            total = counts["cache"] + counts["rest"] + counts["coalesced"]
+            counts["hit_rate"] = round((total - counts["rest"]) / total, 3) if total else None
+        if "user" in result:
+            result["user"]["ttl_cached"] = len(self._users)
+        return result
@@ -0,0 +1,61 @@
+"""Short-lived server-side cache of the unsent remainder of truncated tool results."""
+
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+logger = logging.getLogger("discord-mcp-server")
+
+class Remainder(NamedTuple):
+    """Records of a tool result that did not fit the caller's budget."""
+
+    tool: str
+    result: Dict[str, Any]  # The result's other fields, sent again with each part
+    field: str  # Key of the record list in ``result``
+    records: List[Any]
+    budget: int  # Character budget of the original call, reused by default
+    fields: Optional[Set[str]] = None  # Record attributes the original call selected
+
+class ResultCache:
+    """Hold truncated result remainders for ``ttl`` seconds, keyed by an opaque token.
+
+    A token is single use: taking it removes the entry, and a further
+    remainder gets a new token. At most ``max_entries`` are kept; the
+    oldest are dropped first.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stored = 0
+        self.expired = 0
+
+    def put(self, remainder: Remainder) -> str:
+        self._evict()
+        token = secrets.token_urlsafe(12)
+        self._entries[token] = (time.monotonic() + self.ttl, remainder)
+        self.stored += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return token
+
+    def take(self, token: str) -> Optional[Remainder]:
+        """Remove and return the remainder for ``token``, or None if unknown or expired."""
+        self._evict()
+        entry = self._entries.pop(token, None)
+        return entry[1] if entry is not None else None
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._entries:
+            token, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[token]
+            self.expired += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "stored": self.stored, "expired": self.expired, "ttl": self.ttl}
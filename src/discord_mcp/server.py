@@ -1,16 +1,29 @@
 import os
+import json
 import asyncio
+import hashlib
 import logging
-from datetime import datetime
-from typing import Any, Dict, List, Optional
-from functools import wraps
+from datetime import datetime, timedelta, timezone
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
 
 import discord
 from discord.ext import commands
 from mcp.server import Server
-from mcp.types import Tool, TextContent, EmptyResult
+from mcp.types import Tool, TextContent, EmptyResult, CallToolResult, ListToolsResult
 from mcp.server.stdio import stdio_server
 
+from .gateway import GatewayConfig
+from .members import GuildMembers, MemberIndex, MemberRecord
+from .ratelimit import RateLimitScheduler
+from .readiness import Readiness
+from .resolver import EntityResolver, SingleFlight
+from .shards import ShardStats
+from .results import Remainder, ResultCache
+from .store import MessageStore
+from .structure import StructureVersions
+from .transport import serve_http
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("discord-mcp-server")
@@ -20,894 +33,2390 @@ DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 if not DISCORD_TOKEN:
     raise ValueError("DISCORD_TOKEN environment variable is required")
 
-# Initialize Discord bot with necessary intents
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
-intents.guilds = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+# Intents, member cache flags, message cache size and startup chunking
+gateway_config = GatewayConfig.from_env()
+
+# Pace REST calls from all tools against Discord's bucket and global limits
+rate_limiter = RateLimitScheduler(global_rate=float(os.getenv("DISCORD_GLOBAL_RATE_LIMIT", "50")))
+
+# "library" keeps discord.py's own Member cache; "compact" disables it and
+# keeps only the slotted records in the member index
+MEMBER_CACHE = os.getenv("DISCORD_MEMBER_CACHE", "library").lower()
+if MEMBER_CACHE not in ("library", "compact"):
+    raise ValueError(f"DISCORD_MEMBER_CACHE must be 'library' or 'compact', not {MEMBER_CACHE!r}")
+if MEMBER_CACHE == "compact" and gateway_config.member_cache_flags is not None:
+    raise ValueError("DISCORD_MEMBER_CACHE_FLAGS cannot be combined with DISCORD_MEMBER_CACHE=compact")
+
+# The client is built by create_bot() once every tool is registered, since
+# the "auto" intents profile depends on which tools are enabled. Gateway
+# handlers below are collected and attached to it there.
+bot: Union[commands.Bot, commands.AutoShardedBot] = None
+resolver: EntityResolver = None
+shard_stats: ShardStats = None
+_shard_stats_task: Optional[asyncio.Task] = None
+_client_events: List[Callable[..., Awaitable[Any]]] = []
+_client_listeners: List[Callable[..., Awaitable[Any]]] = []
+
+def client_event(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Register ``func`` as the client's handler for its event (like ``@bot.event``)."""
+    _client_events.append(func)
+    return func
+
+def client_listener(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Register ``func`` as an extra listener for its event (like ``@bot.listen()``)."""
+    _client_listeners.append(func)
+    return func
+
+class DiscordServer(Server):
+    def create_initialization_options(self, notification_options=None, experimental_capabilities=None):
+        """Advertise the tool list version in the initialize result, before any tools/list."""
+        capabilities = {TOOLS_VERSION_META_KEY: {"version": get_tools_version()}, **(experimental_capabilities or {})}
+        return super().create_initialization_options(notification_options, capabilities)
 
 # Initialize MCP server
-app = Server("discord-server")
+app = DiscordServer("discord-server")
 
 # Store Discord client reference
 discord_client = None
 
-@bot.event
+# Calls arriving during login wait for the gateway instead of failing
+readiness = Readiness(
+    timeout=float(os.getenv("DISCORD_READY_TIMEOUT", "30")),
+    max_waiters=int(os.getenv("DISCORD_READY_QUEUE_LIMIT", "100")),
+)
+
+@client_event
+async def setup_hook():
+    global _shard_stats_task
+    readiness.advance("logged_in")
+    if _shard_stats_task is None:
+        _shard_stats_task = asyncio.create_task(shard_stats.run())
+
+@client_event
+async def on_connect():
+    readiness.advance("connected")
+
+@client_event
 async def on_ready():
-    global discord_client
+    global discord_client, _eviction_task
     discord_client = bot
+    readiness.advance("ready")
     logger.info(f"Logged in as {bot.user.name}")
+    # A new session rebuilt the guild caches without change events
+    structure_versions.reset()
+    if INDEX_AT_STARTUP:
+        for guild in bot.guilds:
+            asyncio.create_task(_index_guild_members(guild))
+    else:
+        # Loaded indexes missed the member events of the gap; chunk them again on next use
+        member_index.reset()
+        if MEMBER_INDEX_IDLE_TTL > 0 and _eviction_task is None:
+            _eviction_task = asyncio.create_task(_evict_idle_member_indexes())
 
-# Helper function to ensure Discord client is ready
-def require_discord_client(func):
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        if not discord_client:
-            raise RuntimeError("Discord client not ready")
-        return await func(*args, **kwargs)
-    return wrapper
+# Member lists served from memory, filled by gateway chunking and member events
+member_index = MemberIndex()
+# With DISCORD_CHUNK_GUILDS_AT_STARTUP=false a guild is chunked the first
+# time a member tool needs it, and dropped again after this many idle seconds
+INDEX_AT_STARTUP = gateway_config.chunk_guilds_at_startup is not False
+MEMBER_INDEX_IDLE_TTL = float(os.getenv("DISCORD_MEMBER_INDEX_IDLE_TTL", "1800"))
+member_flights = SingleFlight()
+_eviction_task: Optional[asyncio.Task] = None
 
-@app.list_tools()
-async def list_tools() -> List[Tool]:
-    """List available Discord tools."""
-    return [
-        # Server Information Tools
-        Tool(
-            name="get_server_info",
-            description="Get information about a Discord server",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "server_id": {
-                        "type": "string",
-                        "description": "Discord server (guild) ID"
-                    }
-                },
-                "required": ["server_id"]
+# Channel and role change versions for since_version deltas
+structure_versions = StructureVersions()
+
+async def _index_guild_members(guild: discord.Guild) -> Optional[GuildMembers]:
+    if not bot.intents.members:
+        return None
+    # Member events that arrive while chunking are buffered and replayed onto the loaded list
+    pending = member_index.begin_load(guild.id)
+    try:
+        if MEMBER_CACHE == "compact" or not INDEX_AT_STARTUP:
+            # Request the member list without letting discord.py cache it, so
+            # evicting the index actually frees the memory
+            members = await guild.chunk(cache=False)
+        else:
+            if not guild.chunked:
+                await guild.chunk()
+            members = guild.members
+    except BaseException:
+        member_index.end_load(guild.id, pending)
+        raise
+    return member_index.load(guild.id, members, pending)
+
+async def guild_member_index(guild_id: int) -> Optional[GuildMembers]:
+    """The guild's member index, chunking it on first use when loading lazily.
+
+    Concurrent first uses share one chunk request. Returns None when the
+    members intent is off or startup chunking has not reached the guild yet.
+    """
+    index = member_index.get(guild_id)
+    if index is not None or INDEX_AT_STARTUP or not bot.intents.members:
+        return index
+    guild = bot.get_guild(guild_id)
+    if guild is None:
+        return None
+    index, _ = await member_flights.do(("chunk", guild_id), lambda: _index_guild_members(guild))
+    return index
+
+def _warm_member_index(guild_id: int) -> None:
+    """Start loading the guild's member index in the background, if loading lazily."""
+    if INDEX_AT_STARTUP or member_index.get(guild_id) is not None:
+        return
+
+    def done(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Could not chunk guild {guild_id}: {task.exception()}")
+
+    asyncio.ensure_future(guild_member_index(guild_id)).add_done_callback(done)
+
+async def _evict_idle_member_indexes() -> None:
+    while True:
+        await asyncio.sleep(min(MEMBER_INDEX_IDLE_TTL / 4, 60))
+        member_index.evict_idle(MEMBER_INDEX_IDLE_TTL)
+
+def _install_raw_member_updates() -> None:
+    """Feed GUILD_MEMBER_UPDATE payloads to the index before discord.py parses them.
+
+    discord.py drops updates for members it does not cache and dispatches no
+    event, so with a partial or disabled member cache on_member_update would
+    miss them.
+    """
+    parsers = bot._connection.parsers
+    parse = parsers["GUILD_MEMBER_UPDATE"]
+
+    def parse_member_update(data: Dict[str, Any]) -> None:
+        member_index.apply_raw_update(data)
+        parse(data)
+
+    parsers["GUILD_MEMBER_UPDATE"] = parse_member_update
+
+@client_listener
+async def on_shard_ready(shard_id: int):
+    # The shard's new session rebuilt its guilds without change events
+    structure_versions.reset(lambda guild_id: resolver.shard_for(guild_id) == shard_id)
+
+@client_listener
+async def on_guild_join(guild: discord.Guild):
+    if INDEX_AT_STARTUP:
+        await _index_guild_members(guild)
+
+@client_listener
+async def on_guild_remove(guild: discord.Guild):
+    member_index.drop(guild.id)
+    structure_versions.drop(guild.id)
+
+@client_listener
+async def on_member_join(member: discord.Member):
+    member_index.upsert(member)
+
+@client_listener
+async def on_raw_member_remove(payload: discord.RawMemberRemoveEvent):
+    member_index.remove(payload.guild_id, payload.user.id)
+
+@client_listener
+async def on_user_update(before: discord.User, after: discord.User):
+    member_index.update_user(after)
+
+@client_listener
+async def on_guild_role_delete(role: discord.Role):
+    member_index.drop_role(role.guild.id, role.id)
+    structure_versions.removed("roles", role.guild.id, role.id)
+
+@client_listener
+async def on_guild_role_create(role: discord.Role):
+    structure_versions.changed("roles", role.guild.id, role.id)
+
+@client_listener
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    structure_versions.changed("roles", after.guild.id, after.id)
+
+@client_listener
+async def on_guild_channel_create(channel: discord.abc.GuildChannel):
+    structure_versions.changed("channels", channel.guild.id, channel.id)
+
+@client_listener
+async def on_guild_channel_update(before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+    structure_versions.changed("channels", after.guild.id, after.id)
+
+@client_listener
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+    structure_versions.removed("channels", channel.guild.id, channel.id)
+
+# Optional local archive of channel history (opt-in via DISCORD_MESSAGE_STORE)
+message_store = MessageStore(os.environ["DISCORD_MESSAGE_STORE"]) if os.getenv("DISCORD_MESSAGE_STORE") else None
+
+@client_event
+async def on_disconnect():
+    if message_store is not None:
+        message_store.on_disconnect()
+
+@client_listener
+async def on_message(message: discord.Message):
+    if message_store is not None:
+        message_store.on_message(message)
+
+@client_listener
+async def on_raw_message_edit(payload: discord.RawMessageUpdateEvent):
+    if message_store is not None and "content" in payload.data:
+        message_store.update_content(payload.message_id, payload.data["content"])
+
+@client_listener
+async def on_raw_message_delete(payload: discord.RawMessageDeleteEvent):
+    if message_store is not None:
+        message_store.delete([payload.message_id])
+
+@client_listener
+async def on_raw_bulk_message_delete(payload: discord.RawBulkMessageDeleteEvent):
+    if message_store is not None:
+        message_store.delete(payload.message_ids)
+
+@client_listener
+async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
+    if message_store is not None:
+        message_store.adjust_reaction(payload.message_id, str(payload.emoji), 1)
+
+@client_listener
+async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
+    if message_store is not None:
+        message_store.adjust_reaction(payload.message_id, str(payload.emoji), -1)
+
+@client_listener
+async def on_raw_reaction_clear(payload: discord.RawReactionClearEvent):
+    if message_store is not None:
+        message_store.clear_reactions(payload.message_id)
+
+@client_listener
+async def on_raw_reaction_clear_emoji(payload: discord.RawReactionClearEmojiEvent):
+    if message_store is not None:
+        message_store.clear_reactions(payload.message_id, str(payload.emoji))
+
+# Tool registry: maps tool name -> spec so dispatch is a single dict lookup.
+# Handlers return the structured result; the renderer turns it into the
+# human-readable text content, and only runs when text content is wanted.
+ToolHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+ToolRenderer = Callable[[Dict[str, Any]], Union[str, List[TextContent]]]
+
+@dataclass(frozen=True)
+class ToolSpec:
+    name: str
+    description: str
+    input_schema: Dict[str, Any]
+    output_schema: Dict[str, Any]
+    handler: ToolHandler
+    render: Optional[ToolRenderer] = None
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def to_tool(self) -> Tool:
+        return Tool(
+            name=self.name,
+            description=self.description,
+            inputSchema=self.input_schema,
+            outputSchema=self.output_schema,
+        )
+
+    def content(self, result: Dict[str, Any], projected: bool = False) -> List[TextContent]:
+        """Unstructured content sent alongside ``result``, per DISCORD_TEXT_CONTENT.
+
+        Renderers expect complete records, so ``projected`` results (built
+        with a ``fields`` selection) are sent as JSON instead.
+        """
+        if TEXT_CONTENT == "none":
+            return []
+        if TEXT_CONTENT == "json" or self.render is None or projected:
+            return [TextContent(type="text", text=json.dumps(result, indent=2))]
+        rendered = self.render(result)
+        content = [TextContent(type="text", text=rendered)] if isinstance(rendered, str) else list(rendered)
+        if "continuation" in result:
+            continuation = result["continuation"]
+            content.append(TextContent(type="text", text=(
+                f"Truncated to the response budget; {continuation['remaining']} more records. "
+                f"Call continue_result with token={continuation['token']} for the rest."
+            )))
+        return content
+
+# What goes in each result's content next to structuredContent: "text" (the
+# readable rendering), "json" (the structured result serialized) or "none"
+TEXT_CONTENT = os.getenv("DISCORD_TEXT_CONTENT", "text").lower()
+if TEXT_CONTENT not in ("text", "json", "none"):
+    raise ValueError(f"DISCORD_TEXT_CONTENT must be 'text', 'json' or 'none', not {TEXT_CONTENT!r}")
+
+# Output schema building blocks
+STRING = {"type": "string"}
+INTEGER = {"type": "integer"}
+BOOLEAN = {"type": "boolean"}
+OBJECT = {"type": "object"}
+NULLABLE_STRING = {"type": ["string", "null"]}
+NULLABLE_INTEGER = {"type": ["integer", "null"]}
+
+def array_of(items: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "array", "items": items}
+
+def object_schema(properties: Dict[str, Any], optional: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """Object schema requiring every property not listed in ``optional``."""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": [key for key in properties if key not in optional],
+    }
+
+# Shapes returned by several tools
+ENTITY_SCHEMA = object_schema({"id": STRING, "name": STRING})
+USER_SCHEMA = object_schema({"id": STRING, "name": STRING, "discriminator": STRING, "bot": BOOLEAN, "created_at": STRING})
+MEMBER_SCHEMA = object_schema({
+    "id": STRING,
+    "name": STRING,
+    "nick": NULLABLE_STRING,
+    "global_name": NULLABLE_STRING,
+    "joined_at": NULLABLE_STRING,
+    "roles": array_of(STRING),
+})
+MESSAGE_SCHEMA = object_schema({
+    "id": STRING,
+    "author": STRING,
+    "content": STRING,
+    "timestamp": STRING,
+    "reactions": array_of(object_schema({"emoji": STRING, "count": INTEGER})),
+})
+REACTIONS_SCHEMA = object_schema({
+    "added": INTEGER,
+    "total": INTEGER,
+    "results": array_of(object_schema({"message_id": STRING, "emoji": STRING, "error": NULLABLE_STRING})),
+})
+COMMANDS_SCHEMA = object_schema({"commands": array_of(object_schema({"id": STRING, "name": STRING, "type": INTEGER}))})
+
+# Added to tools registered with a ``records`` key: the response is cut at a
+# record boundary to fit the budget and the rest parked in result_cache
+BUDGET_PROPERTIES = {
+    "max_chars": {
+        "type": "integer",
+        "description": "Approximate size limit for the returned records; the rest can be fetched with continue_result",
+        "minimum": 100
+    },
+    "max_tokens": {
+        "type": "integer",
+        "description": "Like max_chars, counted in tokens (about 4 characters each)",
+        "minimum": 25
+    }
+}
+CONTINUATION_SCHEMA = object_schema({"token": STRING, "remaining": INTEGER})
+CHARS_PER_TOKEN = 4
+
+def fields_property(item_schema: Dict[str, Any]) -> Dict[str, Any]:
+    """``fields`` input for a record tool, offering the record schema's attributes."""
+    return {
+        "type": "array",
+        "items": {"type": "string", "enum": list(item_schema["properties"])},
+        "description": "Only include these attributes in each record (id is always included)"
+    }
+
+def _requested_fields(arguments: Dict[str, Any]) -> Optional[Set[str]]:
+    """Attributes to build for each record, or None for all of them."""
+    if not arguments.get("fields"):
+        return None
+    return {"id", *arguments["fields"]}
+
+def record_builder(builders: Dict[str, Callable[[Any], Any]], fields: Optional[Set[str]] = None) -> Callable[[Any], Dict[str, Any]]:
+    """Return a function building a record with the ``fields`` of ``builders`` (all when None)."""
+    selected = [(key, build) for key, build in builders.items() if fields is None or key in fields]
+    return lambda obj: {key: build(obj) for key, build in selected}
+
+def _project(records: List[Dict[str, Any]], fields: Set[str]) -> List[Dict[str, Any]]:
+    """Drop unrequested attributes from records a handler built in full."""
+    if not records or records[0].keys() <= fields:
+        return records
+    return [{key: value for key, value in record.items() if key in fields} for record in records]
+
+result_cache = ResultCache(ttl=float(os.getenv("DISCORD_RESULT_CACHE_TTL", "300")))
+
+TOOL_REGISTRY: Dict[str, ToolSpec] = {}
+
+# Key carrying a digest of the tool list, under ListToolsResult._meta and
+# the experimental capabilities of the initialize result, so clients can
+# skip re-fetching schemas they already hold
+TOOLS_VERSION_META_KEY = "discord-mcp/toolsVersion"
+
+# Built once from the registry on first use; the registry is frozen after that
+_tool_listing: Optional[ListToolsResult] = None
+
+def tool(
+    name: str,
+    description: str,
+    input_schema: Dict[str, Any],
+    output_schema: Dict[str, Any],
+    render: Optional[ToolRenderer] = None,
+    **meta: Any,
+):
+    """Register a coroutine as the handler for an MCP tool.
+
+    The handler returns a dict matching ``output_schema``. ``render`` builds
+    the text content from it; without one the JSON itself is sent.
+
+    Recognised ``meta`` keys: ``requires_ready`` (default True) holds calls
+    until the Discord client has finished starting; ``intents`` names the
+    gateway intents (beyond ``guilds``) the tool needs, used by the ``auto``
+    intents profile; ``records`` names the result's record list, making the
+    tool accept a max_chars/max_tokens budget and a ``fields`` selection.
+    """
+    if "records" in meta:
+        records = meta["records"]
+        item_schema = output_schema["properties"][records]["items"]
+        input_schema = {**input_schema, "properties": {
+            **input_schema["properties"], "fields": fields_property(item_schema), **BUDGET_PROPERTIES
+        }}
+        output_schema = {**output_schema, "properties": {
+            **output_schema["properties"],
+            records: array_of({**item_schema, "required": ["id"]}),
+            "continuation": CONTINUATION_SCHEMA,
+        }}
+
+    def decorator(func: ToolHandler) -> ToolHandler:
+        if _tool_listing is not None:
+            raise RuntimeError(f"Cannot register tool {name}: tool list already published")
+        if name in TOOL_REGISTRY:
+            raise ValueError(f"Tool already registered: {name}")
+        TOOL_REGISTRY[name] = ToolSpec(name, description, input_schema, output_schema, func, render, meta)
+        return func
+    return decorator
+
+# Comma-separated tool names to expose (DISCORD_TOOLS); unset exposes every tool
+ENABLED_TOOLS = {name.strip() for name in os.getenv("DISCORD_TOOLS", "").split(",") if name.strip()} or None
+
+def tool_enabled(name: str) -> bool:
+    return ENABLED_TOOLS is None or name in ENABLED_TOOLS
+
+def enabled_tools() -> List[ToolSpec]:
+    if ENABLED_TOOLS is not None:
+        unknown = ENABLED_TOOLS - TOOL_REGISTRY.keys()
+        if unknown:
+            raise ValueError(f"DISCORD_TOOLS names unknown tools: {', '.join(sorted(unknown))}")
+    return [spec for spec in TOOL_REGISTRY.values() if tool_enabled(spec.name)]
+
+def get_tool_listing() -> ListToolsResult:
+    """Return the tools/list response, building and versioning it on first call."""
+    global _tool_listing
+    if _tool_listing is None:
+        tools = [spec.to_tool() for spec in enabled_tools()]
+        serialized = json.dumps(
+            [t.model_dump(mode="json", by_alias=True, exclude_none=True) for t in tools],
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        version = hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:16]
+        _tool_listing = ListToolsResult(tools=tools, _meta={TOOLS_VERSION_META_KEY: version})
+        logger.info(f"Published {len(tools)} tools (version {version})")
+    return _tool_listing
+
+def get_tools_version() -> str:
+    """Content hash of the published tool list."""
+    return get_tool_listing().meta[TOOLS_VERSION_META_KEY]
+
+# Diagnostics Tools
+@tool(
+    name="get_bot_status",
+    description="Get the Discord connection status, startup phases, lookup cache and rate-limit statistics",
+    input_schema={"type": "object", "properties": {}},
+    requires_ready=False,
+    output_schema=object_schema({
+        "phase": STRING,
+        "error": NULLABLE_STRING,
+        "phases": OBJECT,
+        "waiting": INTEGER,
+        "max_waiters": INTEGER,
+        "rejected": INTEGER,
+        "timed_out": INTEGER,
+        "ready_timeout": {"type": "number"},
+        "user": NULLABLE_STRING,
+        "guilds": INTEGER,
+        "latency_ms": {"type": ["number", "null"]},
+        "lookups": OBJECT,
+        "rate_limits": OBJECT,
+        "gateway": OBJECT,
+        "member_index": OBJECT,
+        "message_store": {"type": ["object", "null"]},
+        "result_cache": OBJECT,
+        "structure_versions": OBJECT,
+        "shards": array_of(OBJECT),
+    }),
+    render=lambda status: _render_bot_status(status)
+)
+async def handle_get_bot_status(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **readiness.snapshot(),
+        "user": str(bot.user) if bot.user else None,
+        "guilds": len(bot.guilds),
+        "latency_ms": round(bot.latency * 1000, 1) if bot.is_ready() else None,
+        "lookups": resolver.snapshot(),
+        "rate_limits": rate_limiter.snapshot(),
+        "gateway": gateway_config.snapshot(),
+        "member_index": {"cache": MEMBER_CACHE, **member_index.snapshot()},
+        "message_store": message_store.snapshot() if message_store is not None else None,
+        "result_cache": result_cache.snapshot(),
+        "structure_versions": structure_versions.snapshot(),
+        "shards": shard_stats.snapshot(),
+    }
+
+def _render_bot_status(status: Dict[str, Any]) -> str:
+    sections = (
+        "phases", "lookups", "rate_limits", "gateway", "member_index", "message_store", "result_cache",
+        "structure_versions", "shards"
+    )
+    lines = [f"{k}: {v}" for k, v in status.items() if k not in sections]
+    lines += [f"phase {p}: {v['at']} (+{v['after_seconds']}s)" for p, v in status["phases"].items()]
+    lines += [f"lookups {kind}: {counts}" for kind, counts in status["lookups"].items()]
+    lines.append(f"rate limits: {status['rate_limits']}")
+    lines.append(f"gateway: {status['gateway']}")
+    index = dict(status["member_index"])
+    lines.append(f"member index ({index.pop('cache')} cache): {index}")
+    if status["message_store"] is not None:
+        lines.append(f"message store: {status['message_store']}")
+    lines.append(f"result cache: {status['result_cache']}")
+    lines.append(f"structure versions: {status['structure_versions']}")
+    for shard in status["shards"]:
+        lines.append(f"shard {shard['id']}: {({k: v for k, v in shard.items() if k != 'id'})}")
+    return "Bot Status:\n" + "\n".join(lines)
+
+@tool(
+    name="continue_result",
+    description="Get the next part of a list result that was truncated to fit max_chars or max_tokens",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "token": {
+                "type": "string",
+                "description": "Continuation token from the truncated result"
+            },
+            **BUDGET_PROPERTIES
+        },
+        "required": ["token"]
+    },
+    output_schema=object_schema({"tool": STRING, "result": OBJECT, "fields": {"type": ["array", "null"], "items": STRING}}),
+    render=lambda part: TOOL_REGISTRY[part["tool"]].content(part["result"], projected=part["fields"] is not None),
+    requires_ready=False
+)
+async def handle_continue_result(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    remainder = result_cache.take(arguments["token"])
+    if remainder is None:
+        raise ValueError("Unknown or expired continuation token; repeat the original call")
+    result = {**remainder.result, remainder.field: remainder.records}
+    budget = _budget_chars(arguments) or remainder.budget
+    fields = remainder.fields
+    return {
+        "tool": remainder.tool,
+        "result": _fit_budget(remainder.tool, remainder.field, result, budget, fields),
+        "fields": sorted(fields) if fields is not None else None,
+    }
+
+def _budget_chars(arguments: Dict[str, Any]) -> Optional[int]:
+    limits = []
+    if arguments.get("max_chars"):
+        limits.append(int(arguments["max_chars"]))
+    if arguments.get("max_tokens"):
+        limits.append(int(arguments["max_tokens"]) * CHARS_PER_TOKEN)
+    return min(limits) if limits else None
+
+def _fit_budget(
+    tool_name: str, field: str, result: Dict[str, Any], budget: int, fields: Optional[Set[str]] = None
+) -> Dict[str, Any]:
+    """Cut ``result[field]`` at a record boundary to fit ``budget`` characters, caching the rest.
+
+    Sizes are those of the records' JSON. At least one record is always
+    kept, so every continuation makes progress. ``next_*`` page cursors are
+    null in every part but the last.
+    """
+    records = result[field]
+    used = keep = 0
+    for record in records:
+        used += len(json.dumps(record, ensure_ascii=False)) + 1
+        if used > budget and keep > 0:
+            break
+        keep += 1
+    if keep == len(records):
+        return result
+    # Keep the record field's key (and so its position) without a second copy of the records
+    base = {**result, field: None}
+    base.pop("continuation", None)
+    token = result_cache.put(Remainder(tool_name, base, field, records[keep:], budget, fields))
+    # Page cursors point past the last record, so only the final part may carry them
+    cursors = {key: None for key in result if key.startswith("next_")}
+    return {**result, **cursors, field: records[:keep], "continuation": {"token": token, "remaining": len(records) - keep}}
+
+# Server Information Tools
+@tool(
+    name="get_server_info",
+    description="Get information about a Discord server",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server (guild) ID"
             }
-        ),
-        Tool(
-            name="list_members",
-            description="Get a list of members in a server",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "server_id": {
-                        "type": "string",
-                        "description": "Discord server (guild) ID"
-                    },
-                    "limit": {
-                        "type": "number",
-                        "description": "Maximum number of members to fetch",
-                        "minimum": 1,
-                        "maximum": 1000
-                    }
-                },
-                "required": ["server_id"]
+        },
+        "required": ["server_id"]
+    },
+    output_schema=object_schema({
+        "name": STRING,
+        "id": STRING,
+        "owner_id": STRING,
+        "member_count": NULLABLE_INTEGER,
+        "created_at": STRING,
+        "description": NULLABLE_STRING,
+        "premium_tier": INTEGER,
+        "explicit_content_filter": STRING,
+    }),
+    render=lambda info: _render_fields("Server Information", info)
+)
+async def handle_get_server_info(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild = await resolver.guild(int(arguments["server_id"]))
+    return {
+        "name": guild.name,
+        "id": str(guild.id),
+        "owner_id": str(guild.owner_id),
+        "member_count": guild.member_count,
+        "created_at": guild.created_at.isoformat(),
+        "description": guild.description,
+        "premium_tier": guild.premium_tier,
+        "explicit_content_filter": str(guild.explicit_content_filter)
+    }
+
+def _render_fields(title: str, info: Dict[str, Any]) -> str:
+    return f"{title}:\n" + "\n".join(f"{k}: {v}" for k, v in info.items())
+
+@tool(
+    name="list_members",
+    description="Get a list of members in a server, optionally filtered by role, join date or name prefix",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server (guild) ID"
+            },
+            "limit": {
+                "type": "number",
+                "description": "Maximum number of members to fetch (max 1000 per page)",
+                "minimum": 1,
+                "maximum": 1000
+            },
+            "after": {
+                "type": "string",
+                "description": "Cursor returned by the previous page; lists members after it"
+            },
+            "role_id": {
+                "type": "string",
+                "description": "Only list members that have this role"
+            },
+            "joined_after": {
+                "type": "string",
+                "description": "Only list members who joined after this ISO 8601 time"
+            },
+            "name_prefix": {
+                "type": "string",
+                "description": "Only list members whose username, nickname or display name starts with this text (case-insensitive)"
             }
-        ),
-        Tool(
-            name="list_all_channels",
-            description="List all channels (text, voice, category, etc.) in a server",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "server_id": {
-                        "type": "string",
-                        "description": "Discord server (guild) ID"
-                    }
-                },
-                "required": ["server_id"]
+        },
+        "required": ["server_id"]
+    },
+    intents=("members",),
+    output_schema=object_schema({"members": array_of(MEMBER_SCHEMA), "next_after": NULLABLE_STRING}),
+    render=lambda result: _chunked_text(
+        f"Server Members ({len(result['members'])}):",
+        [f"{m['name']} (ID: {m['id']}, Roles: {', '.join(m['roles'])})" for m in result["members"]],
+        f"Next page cursor: after={result['next_after']}" if result["next_after"] else _end_of_page(result, "No more members."),
+    ),
+    records="members"
+)
+async def handle_list_members(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild_id = int(arguments["server_id"])
+    limit = min(int(arguments.get("limit", 100)), 1000)
+    role_id = int(arguments["role_id"]) if "role_id" in arguments else None
+    joined_after = _parse_time(arguments["joined_after"]) if "joined_after" in arguments else None
+    name_prefix = arguments.get("name_prefix") or None
+    after = int(arguments["after"]) if arguments.get("after") else None
+
+    build = record_builder(MEMBER_FIELDS, _requested_fields(arguments))
+
+    index = await guild_member_index(guild_id)
+    if index is not None:
+        members = index.query(after=after, role_id=role_id, joined_after=joined_after, name_prefix=name_prefix, limit=limit)
+    elif not bot.intents.members:
+        # discord.py refuses to list members over REST without the intent as well
+        raise ValueError(f"Listing the members of server {guild_id} requires the server members intent")
+    else:
+        # Guild not indexed yet (startup chunking has not reached it): page through REST
+        guild = await resolver.guild(guild_id)
+        filtered = role_id is not None or joined_after is not None or name_prefix is not None
+        prefix = name_prefix.casefold() if name_prefix else None
+        members = []
+        history = guild.fetch_members(
+            limit=None if filtered else limit,
+            after=discord.Object(after) if after is not None else None,
+        )
+        async for member in history:
+            record = MemberRecord.from_member(member)
+            if record.matches(role_id, joined_after, prefix):
+                members.append(record)
+                if len(members) >= limit:
+                    break
+
+    return {
+        "members": [build(m) for m in members],
+        "next_after": str(members[-1].id) if len(members) == limit else None,
+    }
+
+# Builders for each attribute of a list_members record
+MEMBER_FIELDS: Dict[str, Callable[[MemberRecord], Any]] = {
+    "id": lambda record: str(record.id),
+    "name": lambda record: record.name,
+    "nick": lambda record: record.nick,
+    "global_name": lambda record: record.global_name,
+    "joined_at": lambda record: record.joined_at.isoformat() if record.joined_at else None,
+    "roles": lambda record: [str(role_id) for role_id in record.roles],
+}
+
+# Lines per TextContent block for long list responses
+LIST_CHUNK_LINES = 100
+
+def _end_of_page(result: Dict[str, Any], text: str) -> str:
+    """``text`` for a result without a page cursor, unless the cursor is held back for its last part."""
+    return "The next page cursor comes with the last continuation part." if "continuation" in result else text
+
+def _chunked_text(header: str, lines: List[str], footer: str) -> List[TextContent]:
+    """Split a header/lines/footer response into TextContent blocks of LIST_CHUNK_LINES lines."""
+    chunks = ["\n".join(lines[i:i + LIST_CHUNK_LINES]) for i in range(0, len(lines), LIST_CHUNK_LINES)] or [""]
+    chunks[0] = f"{header}\n{chunks[0]}"
+    chunks[-1] = f"{chunks[-1]}\n\n{footer}"
+    return [TextContent(type="text", text=text) for text in chunks]
+
+@tool(
+    name="list_role_members",
+    description="List members by role membership: members with all of some roles, any of others, and none of a third set",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server (guild) ID"
+            },
+            "all_roles": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Role IDs a member must have every one of"
+            },
+            "any_roles": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Role IDs a member must have at least one of"
+            },
+            "exclude_roles": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Role IDs a member must have none of"
+            },
+            "limit": {
+                "type": "number",
+                "description": "Maximum number of members to return (max 1000 per page)",
+                "minimum": 1,
+                "maximum": 1000
+            },
+            "after": {
+                "type": "string",
+                "description": "Cursor returned by the previous page; lists members after it"
             }
-        ),
-        Tool(
-            name="get_channel_info",
-            description="Get detailed information about a specific channel",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "channel_id": {
-                        "type": "string",
-                        "description": "ID of the channel"
-                    }
-                },
-                "required": ["channel_id"]
+        },
+        "required": ["server_id"]
+    },
+    intents=("members",),
+    output_schema=object_schema({"members": array_of(ENTITY_SCHEMA), "total": INTEGER, "next_after": NULLABLE_STRING}),
+    render=lambda result: _chunked_text(
+        f"Members matching roles ({len(result['members'])} of {result['total']}):",
+        [f"{m['name']} (ID: {m['id']})" for m in result["members"]],
+        f"Next page cursor: after={result['next_after']}" if result["next_after"] else _end_of_page(result, "No more members."),
+    ),
+    records="members"
+)
+async def handle_list_role_members(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild_id = int(arguments["server_id"])
+    index = await guild_member_index(guild_id)
+    if index is None:
+        raise ValueError(f"Members of server {guild_id} are not indexed yet (requires the server members intent)")
+    all_roles = [int(r) for r in arguments.get("all_roles", [])]
+    any_roles = [int(r) for r in arguments.get("any_roles", [])]
+    exclude_roles = [int(r) for r in arguments.get("exclude_roles", [])]
+    if not (all_roles or any_roles or exclude_roles):
+        raise ValueError("Provide at least one of all_roles, any_roles or exclude_roles")
+    limit = min(int(arguments.get("limit", 100)), 1000)
+    after = int(arguments["after"]) if arguments.get("after") else None
+
+    matched = index.with_roles(all_roles, any_roles, exclude_roles)
+    page_ids = sorted(i for i in matched if after is None or i > after)[:limit]
+    return {
+        "members": [{"id": str(i), "name": index.by_id[i].name} for i in page_ids],
+        "total": len(matched),
+        "next_after": str(page_ids[-1]) if len(page_ids) == limit else None,
+    }
+
+@tool(
+    name="find_member",
+    description="Find members by username, nickname or global name prefix, best matches first, to get their user IDs",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server (guild) ID"
+            },
+            "query": {
+                "type": "string",
+                "description": "Start of the name to look for (case-insensitive)",
+                "minLength": 1
+            },
+            "limit": {
+                "type": "number",
+                "description": "Maximum number of matches to return (default 10, max 100)",
+                "minimum": 1,
+                "maximum": 100
+            },
+            "fuzzy": {
+                "type": "boolean",
+                "description": "Also match names containing the query or spelled similarly when prefix matches fall short"
             }
-        ),
-        Tool(
-            name="edit_channel",
-            description="Edit a channel's settings (name, topic, position, category)",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "channel_id": {
-                        "type": "string",
-                        "description": "ID of the channel to edit"
-                    },
-                    "name": {
-                        "type": "string",
-                        "description": "New name for the channel"
-                    },
-                    "topic": {
-                        "type": "string",
-                        "description": "New topic for the channel (text channels only)"
-                    },
-                    "position": {
-                        "type": "integer",
-                        "description": "New position for the channel"
-                    },
-                    "category_id": {
-                        "type": "string",
-                        "description": "ID of the new category for the channel"
-                    },
-                    "reason": {
-                        "type": "string",
-                        "description": "Reason for the edit"
-                    }
-                },
-                "required": ["channel_id"]
+        },
+        "required": ["server_id", "query"]
+    },
+    intents=("members",),
+    output_schema=object_schema({
+        "query": STRING,
+        "matches": array_of(object_schema({
+            "id": STRING,
+            "name": STRING,
+            "nick": NULLABLE_STRING,
+            "global_name": NULLABLE_STRING,
+            "match": {"type": "string", "enum": ["exact", "prefix", "substring", "similar"]},
+        })),
+    }),
+    render=lambda result: _render_member_matches(result),
+    records="matches"
+)
+async def handle_find_member(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild_id = int(arguments["server_id"])
+    query = arguments["query"]
+    limit = min(int(arguments.get("limit", 10)), 100)
+
+    index = await guild_member_index(guild_id)
+    if index is not None:
+        found = index.find(query, limit, fuzzy=bool(arguments.get("fuzzy")))
+    else:
+        # Not indexed: fall back to the gateway's own prefix search
+        guild = await resolver.guild(guild_id)
+        found = [(m, "prefix") for m in await guild.query_members(query=query, limit=limit)]
+    return {
+        "query": query,
+        "matches": [
+            {"id": str(m.id), "name": m.name, "nick": m.nick, "global_name": m.global_name, "match": match}
+            for m, match in found
+        ],
+    }
+
+def _render_member_matches(result: Dict[str, Any]) -> str:
+    if not result["matches"]:
+        return f"No members matching '{result['query']}'."
+    lines = []
+    for m in result["matches"]:
+        aliases = ", ".join(f"{label}: {m[key]}" for label, key in (("nick", "nick"), ("global name", "global_name")) if m[key])
+        lines.append(f"{m['name']} (ID: {m['id']}{', ' + aliases if aliases else ''}) [{m['match']}]")
+    return f"Members matching '{result['query']}' ({len(lines)}):\n" + "\n".join(lines)
+
+# Channel and role listings carry the guild's structure version; passing it
+# back as since_version returns only what changed after it
+SINCE_VERSION_PROPERTY = {
+    "type": "integer",
+    "description": "Version from an earlier call; only entries added, changed or removed since then are returned"
+}
+
+def structure_schema(kind: str, item_schema: Dict[str, Any]) -> Dict[str, Any]:
+    return object_schema({kind: array_of(item_schema), "removed": array_of(STRING), "version": INTEGER, "delta": BOOLEAN})
+
+def _structure_listing(
+    kind: str, guild: discord.Guild, entities: List[Any], build: Callable[[Any], Dict[str, Any]], arguments: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Full list of ``entities``, or only those changed since ``since_version`` when that is known."""
+    since = arguments.get("since_version")
+    version, changes = structure_versions.delta(kind, guild.id, int(since) if since is not None else None)
+    if changes is None:
+        # No version given, or one older than the change history: send everything
+        return {kind: [build(entity) for entity in entities], "removed": [], "version": version, "delta": False}
+    changed, removed = changes
+    return {
+        kind: [build(entity) for entity in entities if entity.id in changed],
+        "removed": [str(entity_id) for entity_id in removed],
+        "version": version,
+        "delta": True,
+    }
+
+def _render_structure(title: str, noun: str, result: Dict[str, Any], lines: List[str]) -> str:
+    if not result["delta"]:
+        return f"{title} ({len(lines)}, version {result['version']}):\n" + "\n".join(lines)
+    text = f"{noun} changes (version {result['version']}): {len(lines)} added or changed, {len(result['removed'])} removed"
+    if lines:
+        text += ":\n" + "\n".join(lines)
+    if result["removed"]:
+        text += "\nRemoved IDs: " + ", ".join(result["removed"])
+    return text
+
+@tool(
+    name="list_all_channels",
+    description="List all channels (text, voice, category, etc.) in a server",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server (guild) ID"
+            },
+            "since_version": SINCE_VERSION_PROPERTY
+        },
+        "required": ["server_id"]
+    },
+    output_schema=structure_schema("channels", object_schema({"name": STRING, "id": STRING, "type": STRING})),
+    render=lambda result: _render_structure(
+        "All Channels", "Channel", result,
+        [f"- {ch['name']} (ID: {ch['id']}, Type: {ch['type']})" for ch in result["channels"]]
+    ),
+    records="channels"
+)
+async def handle_list_all_channels(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild = await resolver.guild(int(arguments["server_id"]))
+    logger.info(f"Raw guild.channels content for list_all_channels: {guild.channels}") # Added logging
+    build = record_builder({
+        "name": lambda channel: channel.name,
+        "id": lambda channel: str(channel.id),
+        "type": lambda channel: str(channel.type),
+    }, _requested_fields(arguments))
+    return _structure_listing("channels", guild, guild.channels, build, arguments)
+
+@tool(
+    name="get_channel_info",
+    description="Get detailed information about a specific channel",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "channel_id": {
+                "type": "string",
+                "description": "ID of the channel"
             }
-        ),
-        # Role Management Tools
-        Tool(
-            name="add_role",
-            description="Add a role to a user",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "server_id": {
-                        "type": "string",
-                        "description": "Discord server ID"
-                    },
-                    "user_id": {
-                        "type": "string",
-                        "description": "User to add role to"
-                    },
-                    "role_id": {
-                        "type": "string",
-                        "description": "Role ID to add"
-                    }
-                },
-                "required": ["server_id", "user_id", "role_id"]
+        },
+        "required": ["channel_id"]
+    },
+    output_schema=object_schema({
+        "id": STRING,
+        "name": STRING,
+        "type": STRING,
+        "position": INTEGER,
+        "category_id": NULLABLE_STRING,
+        "created_at": STRING,
+        "topic": NULLABLE_STRING,
+    }, optional=("topic",)),
+    render=lambda info: _render_fields("Channel Information", info)
+)
+async def handle_get_channel_info(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    channel = await resolver.channel(int(arguments["channel_id"]))
+    info = {
+        "id": str(channel.id),
+        "name": channel.name,
+        "type": str(channel.type),
+        "position": channel.position,
+        "category_id": str(channel.category_id) if channel.category_id else None,
+        "created_at": channel.created_at.isoformat(),
+    }
+    if isinstance(channel, discord.TextChannel):
+        info["topic"] = channel.topic
+    return info
+
+@tool(
+    name="edit_channel",
+    description="Edit a channel's settings (name, topic, position, category)",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "channel_id": {
+                "type": "string",
+                "description": "ID of the channel to edit"
+            },
+            "name": {
+                "type": "string",
+                "description": "New name for the channel"
+            },
+            "topic": {
+                "type": "string",
+                "description": "New topic for the channel (text channels only)"
+            },
+            "position": {
+                "type": "integer",
+                "description": "New position for the channel"
+            },
+            "category_id": {
+                "type": "string",
+                "description": "ID of the new category for the channel"
+            },
+            "reason": {
+                "type": "string",
+                "description": "Reason for the edit"
             }
-        ),
-        Tool(
-            name="remove_role",
-            description="Remove a role from a user",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "server_id": {
-                        "type": "string",
-                        "description": "Discord server ID"
-                    },
-                    "user_id": {
-                        "type": "string",
-                        "description": "User to remove role from"
-                    },
-                    "role_id": {
-                        "type": "string",
-                        "description": "Role ID to remove"
-                    }
-                },
-                "required": ["server_id", "user_id", "role_id"]
+        },
+        "required": ["channel_id"]
+    },
+    output_schema=ENTITY_SCHEMA,
+    render=lambda channel: f"Channel #{channel['name']} (ID: {channel['id']}) edited successfully."
+)
+async def handle_edit_channel(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    channel = await resolver.channel(int(arguments["channel_id"]))
+    edit_args = {}
+    if "name" in arguments:
+        edit_args["name"] = arguments["name"]
+    if "topic" in arguments and isinstance(channel, discord.TextChannel):
+        edit_args["topic"] = arguments["topic"]
+    if "position" in arguments:
+        edit_args["position"] = arguments["position"]
+    if "category_id" in arguments:
+        category = channel.guild.get_channel(int(arguments["category_id"]))
+        if category and isinstance(category, discord.CategoryChannel):
+            edit_args["category"] = category
+    await channel.edit(**edit_args, reason=arguments.get("reason", "Channel edited via MCP"))
+    return {"id": str(channel.id), "name": channel.name}
+
+# Role Management Tools
+@tool(
+    name="add_role",
+    description="Add a role to a user",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server ID"
+            },
+            "user_id": {
+                "type": "string",
+                "description": "User to add role to"
+            },
+            "role_id": {
+                "type": "string",
+                "description": "Role ID to add"
             }
-        ),
-        Tool(
-            name="list_roles",
-            description="List all roles in a server",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "server_id": {
-                        "type": "string",
-                        "description": "Discord server (guild) ID"
-                    }
-                },
-                "required": ["server_id"]
+        },
+        "required": ["server_id", "user_id", "role_id"]
+    },
+    output_schema=object_schema({"role_id": STRING, "role_name": STRING, "user_id": STRING, "user_name": STRING}),
+    render=lambda r: f"Added role {r['role_name']} to user {r['user_name']}"
+)
+async def handle_add_role(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild = await resolver.guild(int(arguments["server_id"]))
+    member = await resolver.member(guild, int(arguments["user_id"]))
+    role = guild.get_role(int(arguments["role_id"]))
+    if not role:
+        raise ValueError(f"Role with ID {arguments['role_id']} not found.")
+    await member.add_roles(role, reason="Role added via MCP")
+    _warm_member_index(guild.id)
+    return {"role_id": str(role.id), "role_name": role.name, "user_id": str(member.id), "user_name": member.name}
+
+@tool(
+    name="remove_role",
+    description="Remove a role from a user",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server ID"
+            },
+            "user_id": {
+                "type": "string",
+                "description": "User to remove role from"
+            },
+            "role_id": {
+                "type": "string",
+                "description": "Role ID to remove"
             }
-        ),
-        Tool(
-            name="create_role",
-            description="Create a new role in a server",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "server_id": {
-                        "type": "string",
-                        "description": "Discord server (guild) ID"
-                    },
-                    "name": {
-                        "type": "string",
-                        "description": "Name for the new role"
-                    },
-                    "color": {
-                        "type": "string",
-                        "description": "Hex color code for the role (e.g., #FF0000)"
-                    },
-                    "reason": {
-                        "type": "string",
-                        "description": "Reason for creating the role"
-                    }
-                },
-                "required": ["server_id", "name"]
+        },
+        "required": ["server_id", "user_id", "role_id"]
+    },
+    output_schema=object_schema({"role_id": STRING, "role_name": STRING, "user_id": STRING, "user_name": STRING}),
+    render=lambda r: f"Removed role {r['role_name']} from user {r['user_name']}"
+)
+async def handle_remove_role(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild = await resolver.guild(int(arguments["server_id"]))
+    member = await resolver.member(guild, int(arguments["user_id"]))
+    role = guild.get_role(int(arguments["role_id"]))
+    if not role:
+        raise ValueError(f"Role with ID {arguments['role_id']} not found.")
+    await member.remove_roles(role, reason="Role removed via MCP")
+    _warm_member_index(guild.id)
+    return {"role_id": str(role.id), "role_name": role.name, "user_id": str(member.id), "user_name": member.name}
+
+# Role requests in flight at once for bulk operations; the rate-limit
+# scheduler paces them against the guild's role bucket
+BULK_ROLE_CONCURRENCY = 8
+
+BULK_ROLE_SCHEMA = object_schema({
+    "role_id": STRING,
+    "role_name": STRING,
+    "action": {"type": "string", "enum": ["add", "remove"]},
+    "changed": INTEGER,
+    "skipped": INTEGER,
+    "failed": array_of(object_schema({"user_id": STRING, "error": STRING})),
+    "remaining": INTEGER,
+    "checkpoint": NULLABLE_STRING,
+})
+
+@tool(
+    name="bulk_add_role",
+    description="Add a role to many users, given as user IDs or a role filter. Users who already have the role are skipped",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server ID"
+            },
+            "role_id": {
+                "type": "string",
+                "description": "Role ID to add"
+            },
+            "user_ids": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Users to add the role to"
+            },
+            "filter_all_roles": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Instead of user_ids, target members having all of these role IDs"
+            },
+            "filter_any_roles": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Instead of user_ids, target members having any of these role IDs"
+            },
+            "filter_exclude_roles": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Instead of user_ids, target members having none of these role IDs"
+            },
+            "checkpoint": {
+                "type": "string",
+                "description": "Checkpoint returned by a previous call; resumes with the users after it"
+            },
+            "max_users": {
+                "type": "number",
+                "description": "Maximum number of users to process in this call (default 1000)",
+                "minimum": 1,
+                "maximum": 5000
+            },
+            "reason": {
+                "type": "string",
+                "description": "Reason for the change"
             }
-        ),
-        Tool(
-            name="delete_role",
-            description="Delete a role from a server",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "server_id": {
-                        "type": "string",
-                        "description": "Discord server (guild) ID"
-                    },
-                    "role_id": {
-                        "type": "string",
-                        "description": "ID of the role to delete"
-                    },
-                    "reason": {
-                        "type": "string",
-                        "description": "Reason for deleting the role"
-                    }
-                },
-                "required": ["server_id", "role_id"]
+        },
+        "required": ["server_id", "role_id"]
+    },
+    intents=("members",),
+    output_schema=BULK_ROLE_SCHEMA,
+    render=lambda result: _render_bulk_role_change(result)
+)
+async def handle_bulk_add_role(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    return await _bulk_role_change(arguments, add=True)
+
+@tool(
+    name="bulk_remove_role",
+    description="Remove a role from many users, given as user IDs or a role filter. Users who do not have the role are skipped",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server ID"
+            },
+            "role_id": {
+                "type": "string",
+                "description": "Role ID to remove"
+            },
+            "user_ids": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Users to remove the role from"
+            },
+            "filter_all_roles": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Instead of user_ids, target members having all of these role IDs"
+            },
+            "filter_any_roles": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Instead of user_ids, target members having any of these role IDs"
+            },
+            "filter_exclude_roles": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Instead of user_ids, target members having none of these role IDs"
+            },
+            "checkpoint": {
+                "type": "string",
+                "description": "Checkpoint returned by a previous call; resumes with the users after it"
+            },
+            "max_users": {
+                "type": "number",
+                "description": "Maximum number of users to process in this call (default 1000)",
+                "minimum": 1,
+                "maximum": 5000
+            },
+            "reason": {
+                "type": "string",
+                "description": "Reason for the change"
             }
-        ),
-        Tool(
-            name="edit_role",
-            description="Edit a role's settings (name, color)",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "server_id": {
-                        "type": "string",
-                        "description": "Discord server (guild) ID"
-                    },
-                    "role_id": {
-                        "type": "string",
-                        "description": "ID of the role to edit"
-                    },
-                    "name": {
-                        "type": "string",
-                        "description": "New name for the role"
-                    },
-                    "color": {
-                        "type": "string",
-                        "description": "New hex color code for the role (e.g., #00FF00)"
-                    },
-                    "reason": {
-                        "type": "string",
-                        "description": "Reason for editing the role"
-                    }
-                },
-                "required": ["server_id", "role_id"]
+        },
+        "required": ["server_id", "role_id"]
+    },
+    intents=("members",),
+    output_schema=BULK_ROLE_SCHEMA,
+    render=lambda result: _render_bulk_role_change(result)
+)
+async def handle_bulk_remove_role(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    return await _bulk_role_change(arguments, add=False)
+
+async def _bulk_role_change(arguments: Dict[str, Any], add: bool) -> Dict[str, Any]:
+    guild = await resolver.guild(int(arguments["server_id"]))
+    role = guild.get_role(int(arguments["role_id"]))
+    if not role:
+        raise ValueError(f"Role with ID {arguments['role_id']} not found.")
+    index = await guild_member_index(guild.id)
+
+    if "user_ids" in arguments:
+        targets = sorted({int(user_id) for user_id in arguments["user_ids"]})
+    else:
+        filters = [[int(r) for r in arguments.get(key, [])] for key in ("filter_all_roles", "filter_any_roles", "filter_exclude_roles")]
+        if not any(filters):
+            raise ValueError("Provide user_ids or at least one filter_*_roles list")
+        if index is None:
+            raise ValueError(f"Members of server {guild.id} are not indexed yet; pass user_ids instead of a role filter")
+        targets = sorted(index.with_roles(*filters))
+    if arguments.get("checkpoint"):
+        checkpoint = int(arguments["checkpoint"])
+        targets = [user_id for user_id in targets if user_id > checkpoint]
+    max_users = min(int(arguments.get("max_users", 1000)), 5000)
+    batch, remaining = targets[:max_users], len(targets) - min(len(targets), max_users)
+
+    def already_done(user_id: int) -> bool:
+        record = index.by_id.get(user_id) if index is not None else None
+        if record is not None:
+            return (role.id in record.roles) == add
+        member = guild.get_member(user_id)
+        return member is not None and (member.get_role(role.id) is not None) == add
+
+    reason = arguments.get("reason", f"Bulk role {'add' if add else 'removal'} via MCP")
+    change = discord_client.http.add_role if add else discord_client.http.remove_role
+    semaphore = asyncio.Semaphore(BULK_ROLE_CONCURRENCY)
+    skipped: List[int] = []
+    pending: List[int] = []
+    for user_id in batch:
+        (skipped if already_done(user_id) else pending).append(user_id)
+
+    async def apply(user_id: int) -> Optional[Dict[str, str]]:
+        async with semaphore:
+            try:
+                await change(guild.id, user_id, role.id, reason=reason)
+            except discord.HTTPException as e:
+                return {"user_id": str(user_id), "error": str(e)}
+        return None
+
+    errors = [error for error in await asyncio.gather(*(apply(user_id) for user_id in pending)) if error]
+    return {
+        "role_id": str(role.id),
+        "role_name": role.name,
+        "action": "add" if add else "remove",
+        "changed": len(pending) - len(errors),
+        "skipped": len(skipped),
+        "failed": errors,
+        "remaining": remaining,
+        "checkpoint": str(batch[-1]) if remaining else None,
+    }
+
+def _render_bulk_role_change(result: Dict[str, Any]) -> str:
+    add = result["action"] == "add"
+    errors = result["failed"]
+    lines = [
+        f"{'Added role' if add else 'Removed role'} {result['role_name']} (ID: {result['role_id']}): {result['changed']} changed, "
+        f"{result['skipped']} already {'had it' if add else 'without it'}, {len(errors)} failed"
+    ]
+    if errors:
+        lines.append("First failures:\n" + "\n".join(f"- {e['user_id']}: {e['error']}" for e in errors[:10]))
+    if result["remaining"]:
+        lines.append(f"{result['remaining']} users remaining. Resume with checkpoint={result['checkpoint']}")
+    return "\n".join(lines)
+
+@tool(
+    name="list_roles",
+    description="List all roles in a server",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server (guild) ID"
+            },
+            "since_version": SINCE_VERSION_PROPERTY
+        },
+        "required": ["server_id"]
+    },
+    output_schema=structure_schema("roles", object_schema({"name": STRING, "id": STRING, "color": STRING})),
+    render=lambda result: _render_structure(
+        "Roles", "Role", result,
+        [f"- {r['name']} (ID: {r['id']}, Color: {r['color']})" for r in result["roles"]]
+    ),
+    records="roles"
+)
+async def handle_list_roles(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild = await resolver.guild(int(arguments["server_id"]))
+    build = record_builder({
+        "name": lambda role: role.name,
+        "id": lambda role: str(role.id),
+        "color": lambda role: str(role.color),
+    }, _requested_fields(arguments))
+    roles = [role for role in guild.roles if not role.is_default()]  # Exclude @everyone
+    return _structure_listing("roles", guild, roles, build, arguments)
+
+@tool(
+    name="create_role",
+    description="Create a new role in a server",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server (guild) ID"
+            },
+            "name": {
+                "type": "string",
+                "description": "Name for the new role"
+            },
+            "color": {
+                "type": "string",
+                "description": "Hex color code for the role (e.g., #FF0000)"
+            },
+            "reason": {
+                "type": "string",
+                "description": "Reason for creating the role"
             }
-        ),
-        # Channel Management Tools
-        Tool(
-            name="create_text_channel",
-            description="Create a new text channel",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "server_id": {
-                        "type": "string",
-                        "description": "Discord server ID"
-                    },
-                    "name": {
-                        "type": "string",
-                        "description": "Channel name"
-                    },
-                    "category_id": {
-                        "type": "string",
-                        "description": "Optional category ID to place channel in"
-                    },
-                    "topic": {
-                        "type": "string",
-                        "description": "Optional channel topic"
-                    }
-                },
-                "required": ["server_id", "name"]
+        },
+        "required": ["server_id", "name"]
+    },
+    output_schema=ENTITY_SCHEMA,
+    render=lambda role: f"Created role '{role['name']}' (ID: {role['id']})"
+)
+async def handle_create_role(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild = await resolver.guild(int(arguments["server_id"]))
+    role_args = {"name": arguments["name"]}
+    if "color" in arguments:
+        try:
+            role_args["color"] = discord.Color(int(arguments["color"].lstrip('#'), 16))
+        except ValueError:
+            raise ValueError("Invalid color format. Use hex code (e.g., #FF0000).") from None
+    new_role = await guild.create_role(**role_args, reason=arguments.get("reason", "Role created via MCP"))
+    return {"id": str(new_role.id), "name": new_role.name}
+
+@tool(
+    name="delete_role",
+    description="Delete a role from a server",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server (guild) ID"
+            },
+            "role_id": {
+                "type": "string",
+                "description": "ID of the role to delete"
+            },
+            "reason": {
+                "type": "string",
+                "description": "Reason for deleting the role"
             }
-        ),
-        Tool(
-            name="delete_channel",
-            description="Delete a channel",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "channel_id": {
-                        "type": "string",
-                        "description": "ID of channel to delete"
-                    },
-                    "reason": {
-                        "type": "string",
-                        "description": "Reason for deletion"
-                    }
-                },
-                "required": ["channel_id"]
+        },
+        "required": ["server_id", "role_id"]
+    },
+    output_schema=ENTITY_SCHEMA,
+    render=lambda role: f"Deleted role '{role['name']}' (ID: {role['id']}) successfully."
+)
+async def handle_delete_role(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild = await resolver.guild(int(arguments["server_id"]))
+    role = guild.get_role(int(arguments["role_id"]))
+    if not role:
+        raise ValueError(f"Role with ID {arguments['role_id']} not found.")
+    await role.delete(reason=arguments.get("reason", "Role deleted via MCP"))
+    return {"id": str(role.id), "name": role.name}
+
+@tool(
+    name="edit_role",
+    description="Edit a role's settings (name, color)",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server (guild) ID"
+            },
+            "role_id": {
+                "type": "string",
+                "description": "ID of the role to edit"
+            },
+            "name": {
+                "type": "string",
+                "description": "New name for the role"
+            },
+            "color": {
+                "type": "string",
+                "description": "New hex color code for the role (e.g., #00FF00)"
+            },
+            "reason": {
+                "type": "string",
+                "description": "Reason for editing the role"
             }
-        ),
-        # Thread Management Tools
-        Tool(
-            name="create_thread",
-            description="Create a new thread from a message or in a channel",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "channel_id": {
-                        "type": "string",
-                        "description": "ID of the channel to create the thread in (required if message_id not provided)"
-                    },
-                    "message_id": {
-                        "type": "string",
-                        "description": "ID of the message to create the thread from (optional)"
-                    },
-                    "name": {
-                        "type": "string",
-                        "description": "Name of the new thread"
-                    },
-                    "content": {
-                        "type": "string",
-                        "description": "Content for the initial message (required for forum channels)"
-                    },
-                    "auto_archive_duration": {
-                        "type": "integer",
-                        "enum": [60, 1440, 4320, 10080],
-                        "description": "Duration in minutes before auto-archiving (60, 1440, 4320, 10080)"
-                    }
-                },
-                "required": ["name"]
+        },
+        "required": ["server_id", "role_id"]
+    },
+    output_schema=ENTITY_SCHEMA,
+    render=lambda role: f"Role '{role['name']}' (ID: {role['id']}) edited successfully."
+)
+async def handle_edit_role(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild = await resolver.guild(int(arguments["server_id"]))
+    role = guild.get_role(int(arguments["role_id"]))
+    if not role:
+        raise ValueError(f"Role with ID {arguments['role_id']} not found.")
+    edit_args = {}
+    if "name" in arguments:
+        edit_args["name"] = arguments["name"]
+    if "color" in arguments:
+        try:
+            edit_args["color"] = discord.Color(int(arguments["color"].lstrip('#'), 16))
+        except ValueError:
+            raise ValueError("Invalid color format. Use hex code (e.g., #00FF00).") from None
+    await role.edit(**edit_args, reason=arguments.get("reason", "Role edited via MCP"))
+    return {"id": str(role.id), "name": role.name}
+
+# Channel Management Tools
+@tool(
+    name="create_text_channel",
+    description="Create a new text channel",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server ID"
+            },
+            "name": {
+                "type": "string",
+                "description": "Channel name"
+            },
+            "category_id": {
+                "type": "string",
+                "description": "Optional category ID to place channel in"
+            },
+            "topic": {
+                "type": "string",
+                "description": "Optional channel topic"
             }
-        ),
-        Tool(
-            name="delete_thread",
-            description="Delete a thread",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "thread_id": {
-                        "type": "string",
-                        "description": "ID of the thread to delete"
-                    },
-                    "reason": {
-                        "type": "string",
-                        "description": "Reason for deletion"
-                    }
-                },
-                "required": ["thread_id"]
+        },
+        "required": ["server_id", "name"]
+    },
+    output_schema=ENTITY_SCHEMA,
+    render=lambda channel: f"Created text channel #{channel['name']} (ID: {channel['id']})"
+)
+async def handle_create_text_channel(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild = await resolver.guild(int(arguments["server_id"]))
+    category = None
+    if "category_id" in arguments:
+        category = guild.get_channel(int(arguments["category_id"]))
+    channel = await guild.create_text_channel(
+        name=arguments["name"],
+        category=category,
+        topic=arguments.get("topic"),
+        reason="Channel created via MCP"
+    )
+    return {"id": str(channel.id), "name": channel.name}
+
+@tool(
+    name="delete_channel",
+    description="Delete a channel",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "channel_id": {
+                "type": "string",
+                "description": "ID of channel to delete"
+            },
+            "reason": {
+                "type": "string",
+                "description": "Reason for deletion"
             }
-        ),
-        Tool(
-            name="archive_thread",
-            description="Archive a thread",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "thread_id": {
-                        "type": "string",
-                        "description": "ID of the thread to archive"
-                    },
-                    "reason": {
-                        "type": "string",
-                        "description": "Reason for archiving"
-                    }
-                },
-                "required": ["thread_id"]
+        },
+        "required": ["channel_id"]
+    },
+    output_schema=object_schema({"id": STRING}),
+    render=lambda channel: "Deleted channel successfully"
+)
+async def handle_delete_channel(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    channel = await resolver.channel(int(arguments["channel_id"]))
+    await channel.delete(reason=arguments.get("reason", "Channel deleted via MCP"))
+    return {"id": str(channel.id)}
+
+# Thread Management Tools
+@tool(
+    name="create_thread",
+    description="Create a new thread from a message or in a channel",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "channel_id": {
+                "type": "string",
+                "description": "ID of the channel to create the thread in (required if message_id not provided)"
+            },
+            "message_id": {
+                "type": "string",
+                "description": "ID of the message to create the thread from (optional)"
+            },
+            "name": {
+                "type": "string",
+                "description": "Name of the new thread"
+            },
+            "content": {
+                "type": "string",
+                "description": "Content for the initial message (required for forum channels)"
+            },
+            "auto_archive_duration": {
+                "type": "integer",
+                "enum": [60, 1440, 4320, 10080],
+                "description": "Duration in minutes before auto-archiving (60, 1440, 4320, 10080)"
             }
-        ),
-        Tool(
-            name="unarchive_thread",
-            description="Unarchive a thread",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "thread_id": {
-                        "type": "string",
-                        "description": "ID of the thread to unarchive"
-                    },
-                    "reason": {
-                        "type": "string",
-                        "description": "Reason for unarchiving"
-                    }
-                },
-                "required": ["thread_id"]
+        },
+        "required": ["name"]
+    },
+    output_schema=ENTITY_SCHEMA,
+    render=lambda thread: f"Created thread '{thread['name']}' (ID: {thread['id']})"
+)
+async def handle_create_thread(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    channel = await resolver.channel(int(arguments["channel_id"]))
+    thread_name = arguments["name"]
+    content = arguments.get("content")
+    auto_archive_duration = arguments.get("auto_archive_duration")
+    reason = arguments.get("reason", "Thread created via MCP")
+
+    if "message_id" in arguments:
+        message = await resolver.message(channel, int(arguments["message_id"]))
+        thread = await message.create_thread(
+            name=thread_name,
+            auto_archive_duration=auto_archive_duration,
+            reason=reason
+        )
+    elif isinstance(channel, discord.ForumChannel):
+        if not content:
+            raise ValueError("Content is required when creating a thread in a forum channel.")
+        thread = await channel.create_thread(
+            name=thread_name,
+            content=content,
+            auto_archive_duration=auto_archive_duration,
+            reason=reason
+        )
+    elif isinstance(channel, discord.TextChannel):
+        thread = await channel.create_thread(
+            name=thread_name,
+            auto_archive_duration=auto_archive_duration,
+            reason=reason
+        )
+    else:
+        raise ValueError("Invalid channel type for creating a thread.")
+    return {"id": str(thread.id), "name": thread.name}
+
+@tool(
+    name="delete_thread",
+    description="Delete a thread",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "thread_id": {
+                "type": "string",
+                "description": "ID of the thread to delete"
+            },
+            "reason": {
+                "type": "string",
+                "description": "Reason for deletion"
             }
-        ),
-        # Message Reaction Tools
-        Tool(
-            name="add_reaction",
-            description="Add a reaction to a message",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "channel_id": {
-                        "type": "string",
-                        "description": "Channel containing the message"
-                    },
-                    "message_id": {
-                        "type": "string",
-                        "description": "Message to react to"
-                    },
-                    "emoji": {
-                        "type": "string",
-                        "description": "Emoji to react with (Unicode or custom emoji ID)"
-                    }
-                },
-                "required": ["channel_id", "message_id", "emoji"]
+        },
+        "required": ["thread_id"]
+    },
+    output_schema=ENTITY_SCHEMA,
+    render=lambda thread: f"Deleted thread '{thread['name']}' (ID: {thread['id']})."
+)
+async def handle_delete_thread(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    thread = await resolver.channel(int(arguments["thread_id"]))
+    if isinstance(thread, discord.Thread):
+        await thread.delete(reason=arguments.get("reason", "Thread deleted via MCP"))
+        return {"id": str(thread.id), "name": thread.name}
+    raise ValueError(f"Channel ID {arguments['thread_id']} is not a thread.")
+
+@tool(
+    name="archive_thread",
+    description="Archive a thread",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "thread_id": {
+                "type": "string",
+                "description": "ID of the thread to archive"
+            },
+            "reason": {
+                "type": "string",
+                "description": "Reason for archiving"
             }
-        ),
-        Tool(
-            name="add_multiple_reactions",
-            description="Add multiple reactions to a message",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "channel_id": {
-                        "type": "string",
-                        "description": "Channel containing the message"
-                    },
-                    "message_id": {
-                        "type": "string",
-                        "description": "Message to react to"
-                    },
-                    "emojis": {
-                        "type": "array",
-                        "items": {
-                            "type": "string",
-                            "description": "Emoji to react with (Unicode or custom emoji ID)"
-                        },
-                        "description": "List of emojis to add as reactions"
-                    }
-                },
-                "required": ["channel_id", "message_id", "emojis"]
+        },
+        "required": ["thread_id"]
+    },
+    output_schema=ENTITY_SCHEMA,
+    render=lambda thread: f"Archived thread '{thread['name']}' (ID: {thread['id']})."
+)
+async def handle_archive_thread(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    thread = await resolver.channel(int(arguments["thread_id"]))
+    if isinstance(thread, discord.Thread):
+        await thread.edit(archived=True, reason=arguments.get("reason", "Thread archived via MCP"))
+        return {"id": str(thread.id), "name": thread.name}
+    raise ValueError(f"Channel ID {arguments['thread_id']} is not a thread.")
+
+@tool(
+    name="unarchive_thread",
+    description="Unarchive a thread",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "thread_id": {
+                "type": "string",
+                "description": "ID of the thread to unarchive"
+            },
+            "reason": {
+                "type": "string",
+                "description": "Reason for unarchiving"
             }
-        ),
-        Tool(
-            name="remove_reaction",
-            description="Remove a reaction from a message",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "channel_id": {
-                        "type": "string",
-                        "description": "Channel containing the message"
-                    },
-                    "message_id": {
-                        "type": "string",
-                        "description": "Message to remove reaction from"
-                    },
-                    "emoji": {
-                        "type": "string",
-                        "description": "Emoji to remove (Unicode or custom emoji ID)"
-                    }
-                },
-                "required": ["channel_id", "message_id", "emoji"]
+        },
+        "required": ["thread_id"]
+    },
+    output_schema=ENTITY_SCHEMA,
+    render=lambda thread: f"Unarchived thread '{thread['name']}' (ID: {thread['id']})."
+)
+async def handle_unarchive_thread(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    thread = await resolver.channel(int(arguments["thread_id"]))
+    if isinstance(thread, discord.Thread):
+        await thread.edit(archived=False, reason=arguments.get("reason", "Thread unarchived via MCP"))
+        return {"id": str(thread.id), "name": thread.name}
+    raise ValueError(f"Channel ID {arguments['thread_id']} is not a thread.")
+
+# Message Reaction Tools
+@tool(
+    name="add_reaction",
+    description="Add a reaction to a message",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "channel_id": {
+                "type": "string",
+                "description": "Channel containing the message"
+            },
+            "message_id": {
+                "type": "string",
+                "description": "Message to react to"
+            },
+            "emoji": {
+                "type": "string",
+                "description": "Emoji to react with (Unicode or custom emoji ID)"
             }
-        ),
-        Tool(
-            name="send_message",
-            description="Send a message to a specific channel",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "channel_id": {
-                        "type": "string",
-                        "description": "Discord channel ID"
-                    },
-                    "content": {
-                        "type": "string",
-                        "description": "Message content"
-                    }
+        },
+        "required": ["channel_id", "message_id", "emoji"]
+    },
+    output_schema=object_schema({"message_id": STRING, "emoji": STRING}),
+    render=lambda r: f"Added reaction {r['emoji']} to message"
+)
+async def handle_add_reaction(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    channel = await resolver.channel(int(arguments["channel_id"]))
+    message = await resolver.message(channel, int(arguments["message_id"]))
+    await message.add_reaction(arguments["emoji"])
+    return {"message_id": str(message.id), "emoji": arguments["emoji"]}
+
+# Reaction requests in flight at once; the rate-limit scheduler paces them
+# against the channel's reaction bucket
+REACTION_CONCURRENCY = 4
+# Discord allows 20 distinct reactions per message
+MAX_REACTION_EMOJIS = 20
+MAX_REACTION_MESSAGES = 50
+
+@tool(
+    name="add_multiple_reactions",
+    description="Add multiple reactions to a message",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "channel_id": {
+                "type": "string",
+                "description": "Channel containing the message"
+            },
+            "message_id": {
+                "type": "string",
+                "description": "Message to react to"
+            },
+            "emojis": {
+                "type": "array",
+                "items": {
+                    "type": "string",
+                    "description": "Emoji to react with (Unicode or custom emoji ID)"
                 },
-                "required": ["channel_id", "content"]
+                "description": "List of emojis to add as reactions",
+                "maxItems": MAX_REACTION_EMOJIS
             }
-        ),
-        Tool(
-            name="read_messages",
-            description="Read recent messages from a channel",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "channel_id": {
-                        "type": "string",
-                        "description": "Discord channel ID"
-                    },
-                    "limit": {
-                        "type": "number",
-                        "description": "Number of messages to fetch (max 100)",
-                        "minimum": 1,
-                        "maximum": 100
-                    }
+        },
+        "required": ["channel_id", "message_id", "emojis"]
+    },
+    output_schema=REACTIONS_SCHEMA,
+    render=lambda result: _render_message_reactions(result)
+)
+async def handle_add_multiple_reactions(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    channel = await resolver.channel(int(arguments["channel_id"]))
+    return await _apply_reactions(channel, [int(arguments["message_id"])], arguments["emojis"])
+
+def _render_message_reactions(result: Dict[str, Any]) -> str:
+    results = result["results"]
+    if result["added"] == result["total"]:
+        return f"Added reactions: {', '.join(r['emoji'] for r in results)} to message"
+    lines = []
+    for r in results:
+        outcome = "added" if r["error"] is None else f"failed ({r['error']})"
+        lines.append(f"- {r['emoji']}: {outcome}")
+    return f"Added {result['added']} of {result['total']} reactions to message:\n" + "\n".join(lines)
+
+@tool(
+    name="add_reactions_to_messages",
+    description="Add the same set of reactions to several messages in a channel",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "channel_id": {
+                "type": "string",
+                "description": "Channel containing the messages"
+            },
+            "message_ids": {
+                "type": "array",
+                "items": {
+                    "type": "string"
                 },
-                "required": ["channel_id"]
-            }
-        ),
-        Tool(
-            name="get_user_info",
-            description="Get information about a Discord user",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "string",
-                        "description": "Discord user ID"
-                    }
+                "description": f"Messages to react to (max {MAX_REACTION_MESSAGES})",
+                "maxItems": MAX_REACTION_MESSAGES
+            },
+            "emojis": {
+                "type": "array",
+                "items": {
+                    "type": "string",
+                    "description": "Emoji to react with (Unicode or custom emoji ID)"
                 },
-                "required": ["user_id"]
+                "description": "List of emojis to add to every message",
+                "maxItems": MAX_REACTION_EMOJIS
             }
-        ),
-        Tool(
-            name="moderate_message",
-            description="Delete a message and optionally timeout the user",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "channel_id": {
-                        "type": "string",
-                        "description": "Channel ID containing the message"
-                    },
-                    "message_id": {
-                        "type": "string",
-                        "description": "ID of message to moderate"
-                    },
-                    "reason": {
-                        "type": "string",
-                        "description": "Reason for moderation"
-                    },
-                    "timeout_minutes": {
-                        "type": "number",
-                        "description": "Optional timeout duration in minutes",
-                        "minimum": 0,
-                        "maximum": 40320  # Max 4 weeks
-                    }
-                },
-                "required": ["channel_id", "message_id", "reason"]
+        },
+        "required": ["channel_id", "message_ids", "emojis"]
+    },
+    output_schema=REACTIONS_SCHEMA,
+    render=lambda result: _render_bulk_reactions(result)
+)
+async def handle_add_reactions_to_messages(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    channel = await resolver.channel(int(arguments["channel_id"]))
+    message_ids = [int(message_id) for message_id in arguments["message_ids"]]
+    return await _apply_reactions(channel, message_ids, arguments["emojis"])
+
+def _render_bulk_reactions(result: Dict[str, Any]) -> str:
+    results = result["results"]
+    messages = len(dict.fromkeys(r["message_id"] for r in results))
+    failures = [f"- {r['message_id']} {r['emoji']}: {r['error']}" for r in results if r["error"] is not None]
+    text = f"Added {result['added']} of {result['total']} reactions across {messages} messages"
+    if failures:
+        text += ". Failed:\n" + "\n".join(failures)
+    return text
+
+async def _apply_reactions(channel: Any, message_ids: List[int], emojis: List[str]) -> Dict[str, Any]:
+    """Add every emoji to every message, reporting the outcome of each reaction.
+
+    Up to REACTION_CONCURRENCY reactions are in flight at once and the
+    rate-limit scheduler releases them in order as the channel's reaction
+    bucket resets, instead of paying a full round-trip per reaction.
+    Partial messages avoid fetching each message first.
+    """
+    if not hasattr(channel, "get_partial_message"):
+        raise ValueError(f"Channel {channel.id} does not contain messages")
+    if len(message_ids) > MAX_REACTION_MESSAGES or len(emojis) > MAX_REACTION_EMOJIS:
+        raise ValueError(f"At most {MAX_REACTION_MESSAGES} messages and {MAX_REACTION_EMOJIS} emojis per call")
+    targets = [(message_id, emoji) for message_id in message_ids for emoji in emojis]
+    semaphore = asyncio.Semaphore(REACTION_CONCURRENCY)
+
+    async def react(message_id: int, emoji: str) -> None:
+        async with semaphore:
+            await channel.get_partial_message(message_id).add_reaction(emoji)
+
+    outcomes = await asyncio.gather(
+        *(react(message_id, emoji) for message_id, emoji in targets),
+        return_exceptions=True,
+    )
+    results = []
+    for (message_id, emoji), outcome in zip(targets, outcomes):
+        if isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+        error = str(outcome) if isinstance(outcome, Exception) else None
+        results.append({"message_id": str(message_id), "emoji": emoji, "error": error})
+    added = sum(1 for r in results if r["error"] is None)
+    return {"added": added, "total": len(results), "results": results}
+
+@tool(
+    name="remove_reaction",
+    description="Remove a reaction from a message",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "channel_id": {
+                "type": "string",
+                "description": "Channel containing the message"
+            },
+            "message_id": {
+                "type": "string",
+                "description": "Message to remove reaction from"
+            },
+            "emoji": {
+                "type": "string",
+                "description": "Emoji to remove (Unicode or custom emoji ID)"
             }
-        ),
-        # Application Command Tools
-        Tool(
-            name="list_global_commands",
-            description="List all global application commands registered for the bot.",
-            inputSchema={"type": "object", "properties": {}} # No input needed
-        ),
-        Tool(
-            name="list_guild_commands",
-            description="List all application commands registered for the bot in a specific guild.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "server_id": {
-                        "type": "string",
-                        "description": "Discord server (guild) ID to list commands for."
-                    }
-                },
-                "required": ["server_id"]
+        },
+        "required": ["channel_id", "message_id", "emoji"]
+    },
+    output_schema=object_schema({"message_id": STRING, "emoji": STRING}),
+    render=lambda r: f"Removed reaction {r['emoji']} from message"
+)
+async def handle_remove_reaction(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    channel = await resolver.channel(int(arguments["channel_id"]))
+    message = await resolver.message(channel, int(arguments["message_id"]))
+    await message.remove_reaction(arguments["emoji"], discord_client.user)
+    return {"message_id": str(message.id), "emoji": arguments["emoji"]}
+
+@tool(
+    name="send_message",
+    description="Send a message to a specific channel",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "channel_id": {
+                "type": "string",
+                "description": "Discord channel ID"
+            },
+            "content": {
+                "type": "string",
+                "description": "Message content"
+            }
+        },
+        "required": ["channel_id", "content"]
+    },
+    output_schema=object_schema({"id": STRING, "channel_id": STRING}),
+    render=lambda message: f"Message sent successfully. Message ID: {message['id']}"
+)
+async def handle_send_message(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    channel = await resolver.channel(int(arguments["channel_id"]))
+    message = await channel.send(arguments["content"])
+    return {"id": str(message.id), "channel_id": str(channel.id)}
+
+# Messages per TextContent block when returning long histories
+READ_MESSAGES_CHUNK = 100
+MAX_READ_MESSAGES = 1000
+
+@tool(
+    name="read_messages",
+    description="Read messages from a channel, newest first by default. Use the returned cursor with before/after to page through history",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "channel_id": {
+                "type": "string",
+                "description": "Discord channel ID"
+            },
+            "limit": {
+                "type": "number",
+                "description": f"Number of messages to fetch (max {MAX_READ_MESSAGES}; max 101 with around)",
+                "minimum": 1,
+                "maximum": MAX_READ_MESSAGES
+            },
+            "before": {
+                "type": "string",
+                "description": "Only return messages older than this message ID"
+            },
+            "after": {
+                "type": "string",
+                "description": "Only return messages newer than this message ID, oldest first"
+            },
+            "around": {
+                "type": "string",
+                "description": "Return messages around this message ID"
             }
-        ),
+        },
+        "required": ["channel_id"]
+    },
+    intents=("message_content",),
+    output_schema=object_schema({
+        "messages": array_of(MESSAGE_SCHEMA),
+        "next_before": NULLABLE_STRING,
+        "next_after": NULLABLE_STRING,
+    }),
+    render=lambda result: _render_messages(result),
+    records="messages"
+)
+async def handle_read_messages(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    channel = await resolver.channel(int(arguments["channel_id"]))
+    cursors = {key: discord.Object(int(arguments[key])) for key in ("before", "after", "around") if arguments.get(key)}
+    if len(cursors) > 1:
+        raise ValueError("Use only one of before, after or around")
+    limit = min(int(arguments.get("limit", 10)), 101 if "around" in cursors else MAX_READ_MESSAGES)
+
+    fields = _requested_fields(arguments)
+    messages = [record async for record in _read_message_records(channel, cursors, limit, fields)]
+    next_before = next_after = None
+    if messages and len(messages) >= limit:
+        ids = [int(record["id"]) for record in messages]
+        if "after" in cursors:
+            next_after = str(max(ids))
+        elif "around" in cursors:
+            next_before, next_after = str(min(ids)), str(max(ids))
+        else:
+            next_before = str(min(ids))
+    return {"messages": messages, "next_before": next_before, "next_after": next_after}
+
+def _render_messages(result: Dict[str, Any]) -> Union[str, List[TextContent]]:
+    messages, before, after = result["messages"], result["next_before"], result["next_after"]
+    if before and after:
+        cursor_text = f"Older messages cursor: before={before}; newer messages cursor: after={after}"
+    elif after:
+        cursor_text = f"Next page cursor: after={after}"
+    elif before:
+        cursor_text = f"Next page cursor: before={before}"
+    else:
+        cursor_text = _end_of_page(result, "No more messages in this direction.")
+    header = f"Retrieved {len(messages)} messages:\n\n"
+    if not messages:
+        return f"{header}{cursor_text}"
+    chunks = [
+        "\n".join(_format_message(m) for m in messages[i:i + READ_MESSAGES_CHUNK])
+        for i in range(0, len(messages), READ_MESSAGES_CHUNK)
     ]
+    chunks[0] = header + chunks[0]
+    chunks[-1] = f"{chunks[-1]}\n\n{cursor_text}"
+    return [TextContent(type="text", text=text) for text in chunks]
 
-@app.call_tool()
-@require_discord_client
-async def call_tool(name: str, arguments: Any) -> List[TextContent]:
-    """Handle Discord tool calls with error handling."""
-    try:
-        # --- Existing Tool Handlers ---
-        if name == "send_message":
-            channel = await discord_client.fetch_channel(int(arguments["channel_id"]))
-            message = await channel.send(arguments["content"])
-            return [TextContent(type="text", text=f"Message sent successfully. Message ID: {message.id}")]
-
-        elif name == "read_messages":
-            channel = await discord_client.fetch_channel(int(arguments["channel_id"]))
-            limit = min(int(arguments.get("limit", 10)), 100)
-            messages = []
-            async for message in channel.history(limit=limit):
-                reaction_data = [
-                    {"emoji": str(reaction.emoji), "count": reaction.count}
-                    for reaction in message.reactions
-                ]
-                messages.append({
-                    "id": str(message.id),
-                    "author": str(message.author),
-                    "content": message.content,
-                    "timestamp": message.created_at.isoformat(),
-                    "reactions": reaction_data
-                })
-            # Corrected reaction formatting
-            formatted_messages = []
-            for m in messages:
-                reaction_strs = [f"{r['emoji']}({r['count']})" for r in m['reactions']]
-                reactions_text = ', '.join(reaction_strs) if reaction_strs else 'No reactions'
-                formatted_messages.append(
-                    f"{m['author']} ({m['timestamp']}): {m['content']}\n"
-                    f"Reactions: {reactions_text}"
-                )
-            message_list = "\n".join(formatted_messages)
-            return [TextContent(type="text", text=f"Retrieved {len(messages)} messages:\n\n{message_list}")]
-
-        elif name == "get_user_info":
-            user = await discord_client.fetch_user(int(arguments["user_id"]))
-            user_info = {
-                "id": str(user.id),
-                "name": user.name,
-                "discriminator": user.discriminator,
-                "bot": user.bot,
-                "created_at": user.created_at.isoformat()
+async def _read_message_records(
+    channel: Any, cursors: Dict[str, discord.Object], limit: int, fields: Optional[Set[str]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield message records from the local store when it covers the range, else from REST."""
+    if message_store is not None and "around" not in cursors:
+        if "after" in cursors:
+            records = await message_store.read_after(channel, cursors["after"].id, limit, fields)
+        else:
+            before = cursors["before"].id if "before" in cursors else None
+            records = await message_store.read_before(channel, before, limit, fields)
+        if records is not None:
+            for record in records:
+                yield record
+            return
+    build = record_builder(MESSAGE_FIELDS, fields)
+    async for message in channel.history(limit=limit, **cursors):
+        yield build(message)
+
+MESSAGE_FIELDS: Dict[str, Callable[[discord.Message], Any]] = {
+    "id": lambda message: str(message.id),
+    "author": lambda message: str(message.author),
+    "content": lambda message: message.content,
+    "timestamp": lambda message: message.created_at.isoformat(),
+    "reactions": lambda message: [
+        {"emoji": str(reaction.emoji), "count": reaction.count}
+        for reaction in message.reactions
+    ],
+}
+
+def _format_message(m: Dict[str, Any]) -> str:
+    reaction_strs = [f"{r['emoji']}({r['count']})" for r in m['reactions']]
+    reactions_text = ', '.join(reaction_strs) if reaction_strs else 'No reactions'
+    return (
+        f"{m['author']} ({m['timestamp']}, ID: {m['id']}): {m['content']}\n"
+        f"Reactions: {reactions_text}"
+    )
+
+@tool(
+    name="search_messages",
+    description="Full-text search over archived messages (requires DISCORD_MESSAGE_STORE). Results are ranked by relevance and paginated with offset",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "Words to search for; every word must match"
+            },
+            "server_id": {
+                "type": "string",
+                "description": "Only search messages from this server"
+            },
+            "channel_id": {
+                "type": "string",
+                "description": "Only search this channel (synced before searching)"
+            },
+            "author_id": {
+                "type": "string",
+                "description": "Only match messages by this user ID"
+            },
+            "after": {
+                "type": "string",
+                "description": "Only match messages sent at or after this ISO 8601 time"
+            },
+            "before": {
+                "type": "string",
+                "description": "Only match messages sent before this ISO 8601 time"
+            },
+            "has_attachments": {
+                "type": "boolean",
+                "description": "Only match messages with (true) or without (false) attachments"
+            },
+            "limit": {
+                "type": "number",
+                "description": "Number of results per page (max 100)",
+                "minimum": 1,
+                "maximum": 100
+            },
+            "offset": {
+                "type": "number",
+                "description": "Number of results to skip, from a previous page's next offset",
+                "minimum": 0
+            }
+        },
+        "required": ["query"]
+    },
+    intents=("message_content",),
+    output_schema=object_schema({
+        "results": array_of(object_schema({
+            "id": STRING,
+            "channel_id": STRING,
+            "author": STRING,
+            "timestamp": STRING,
+            "attachments": INTEGER,
+            "snippet": STRING,
+        })),
+        "offset": INTEGER,
+        "next_offset": NULLABLE_INTEGER,
+    }),
+    render=lambda result: _render_search_results(result),
+    records="results"
+)
+async def handle_search_messages(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    if message_store is None or not message_store.searchable:
+        raise ValueError("Message search requires the message store; set DISCORD_MESSAGE_STORE to a SQLite file path")
+    channel_id = int(arguments["channel_id"]) if "channel_id" in arguments else None
+    if channel_id is not None:
+        await message_store.sync(await resolver.channel(channel_id), READ_MESSAGES_CHUNK)
+    limit = min(int(arguments.get("limit", 20)), 100)
+    offset = int(arguments.get("offset", 0))
+    results, has_more = message_store.search(
+        arguments["query"],
+        guild_id=int(arguments["server_id"]) if "server_id" in arguments else None,
+        channel_id=channel_id,
+        author_id=int(arguments["author_id"]) if "author_id" in arguments else None,
+        after=_parse_time(arguments["after"]) if "after" in arguments else None,
+        before=_parse_time(arguments["before"]) if "before" in arguments else None,
+        has_attachments=arguments.get("has_attachments"),
+        limit=limit,
+        offset=offset,
+    )
+    return {"results": results, "offset": offset, "next_offset": offset + limit if has_more else None}
+
+def _render_search_results(result: Dict[str, Any]) -> str:
+    results, offset = result["results"], result["offset"]
+    if not results:
+        return "No messages matched."
+    lines = [
+        f"- {r['author']} in {r['channel_id']} ({r['timestamp']}, ID: {r['id']}"
+        f"{', ' + str(r['attachments']) + ' attachments' if r['attachments'] else ''}): {r['snippet']}"
+        for r in results
+    ]
+    footer = f"Next page: offset={result['next_offset']}" if result["next_offset"] is not None else "No more results."
+    return f"Search results {offset + 1}-{offset + len(results)}:\n" + "\n".join(lines) + f"\n\n{footer}"
+
+def _parse_time(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp, treating naive values as UTC."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+@tool(
+    name="get_user_info",
+    description="Get information about a Discord user",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "user_id": {
+                "type": "string",
+                "description": "Discord user ID"
             }
-            return [TextContent(type="text", text=f"User information:\n" + "\n".join(f"{k}: {v}" for k, v in user_info.items()))]
-
-        elif name == "moderate_message":
-            channel = await discord_client.fetch_channel(int(arguments["channel_id"]))
-            message = await channel.fetch_message(int(arguments["message_id"]))
-            await message.delete(reason=arguments.get("reason", "Message deleted via MCP"))
-            if "timeout_minutes" in arguments and arguments["timeout_minutes"] > 0:
-                if isinstance(message.author, discord.Member):
-                    duration = discord.utils.utcnow() + datetime.timedelta(minutes=arguments["timeout_minutes"])
-                    await message.author.timeout(duration, reason=arguments["reason"])
-                    return [TextContent(type="text", text=f"Message deleted and user timed out for {arguments['timeout_minutes']} minutes.")]
-            return [TextContent(type="text", text="Message deleted successfully.")]
-
-        elif name == "get_server_info":
-            guild = await discord_client.fetch_guild(int(arguments["server_id"]))
-            info = {
-                "name": guild.name,
-                "id": str(guild.id),
-                "owner_id": str(guild.owner_id),
-                "member_count": guild.member_count,
-                "created_at": guild.created_at.isoformat(),
-                "description": guild.description,
-                "premium_tier": guild.premium_tier,
-                "explicit_content_filter": str(guild.explicit_content_filter)
+        },
+        "required": ["user_id"]
+    },
+    output_schema=USER_SCHEMA,
+    render=lambda user: _render_fields("User information", user)
+)
+async def handle_get_user_info(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    return _user_info(await resolver.user(int(arguments["user_id"])))
+
+USER_FIELDS: Dict[str, Callable[[discord.User], Any]] = {
+    "id": lambda user: str(user.id),
+    "name": lambda user: user.name,
+    "discriminator": lambda user: user.discriminator,
+    "bot": lambda user: user.bot,
+    "created_at": lambda user: user.created_at.isoformat(),
+}
+_user_info = record_builder(USER_FIELDS)
+
+# REST user fetches in flight at once for get_users cache misses
+USER_FETCH_CONCURRENCY = 8
+MAX_BATCH_USERS = 100
+
+@tool(
+    name="get_users",
+    description="Get information about many Discord users in one call",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "user_ids": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": f"Discord user IDs (max {MAX_BATCH_USERS})",
+                "minItems": 1,
+                "maxItems": MAX_BATCH_USERS
             }
-            return [TextContent(type="text", text=f"Server Information:\n" + "\n".join(f"{k}: {v}" for k, v in info.items()))]
-
-        elif name == "list_members":
-            guild = await discord_client.fetch_guild(int(arguments["server_id"]))
-            limit = min(int(arguments.get("limit", 100)), 1000)
-            members = []
-            async for member in guild.fetch_members(limit=limit):
-                members.append({
-                    "id": str(member.id),
-                    "name": member.name,
-                    "nick": member.nick,
-                    "joined_at": member.joined_at.isoformat() if member.joined_at else None,
-                    "roles": [str(role.id) for role in member.roles[1:]]  # Skip @everyone
-                })
-            member_list = "\n".join([f"{m['name']} (ID: {m['id']}, Roles: {', '.join(m['roles'])})" for m in members])
-            return [TextContent(type="text", text=f"Server Members ({len(members)}):\n{member_list}")]
-
-        elif name == "list_all_channels":
-            guild = await discord_client.fetch_guild(int(arguments["server_id"]))
-            logger.info(f"Raw guild.channels content for list_all_channels: {guild.channels}") # Added logging
-            all_channels = [
-                {"name": channel.name, "id": str(channel.id), "type": str(channel.type)}
-                for channel in guild.channels
-            ]
-            channel_list_str = "\n".join([f"- {ch['name']} (ID: {ch['id']}, Type: {ch['type']})" for ch in all_channels])
-            return [TextContent(type="text", text=f"All Channels ({len(all_channels)}):\n{channel_list_str}")]
-
-        elif name == "get_channel_info":
-            channel = await discord_client.fetch_channel(int(arguments["channel_id"]))
-            info = {
-                "id": str(channel.id),
-                "name": channel.name,
-                "type": str(channel.type),
-                "position": channel.position,
-                "category_id": str(channel.category_id) if channel.category_id else None,
-                "created_at": channel.created_at.isoformat(),
+        },
+        "required": ["user_ids"]
+    },
+    output_schema=object_schema({
+        "users": array_of(USER_SCHEMA),
+        "not_found": array_of(STRING),
+        "errors": {"type": "object", "additionalProperties": STRING},
+    }),
+    records="users"
+)
+async def handle_get_users(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    user_ids = list(dict.fromkeys(int(user_id) for user_id in arguments["user_ids"]))[:MAX_BATCH_USERS]
+    semaphore = asyncio.Semaphore(USER_FETCH_CONCURRENCY)
+
+    async def lookup(user_id: int) -> discord.User:
+        async with semaphore:
+            return await resolver.user(user_id)
+
+    results = await asyncio.gather(*(lookup(user_id) for user_id in user_ids), return_exceptions=True)
+    build = record_builder(USER_FIELDS, _requested_fields(arguments))
+    users, not_found, errors = [], [], {}
+    for user_id, result in zip(user_ids, results):
+        if isinstance(result, discord.NotFound):
+            not_found.append(str(user_id))
+        elif isinstance(result, Exception):
+            errors[str(user_id)] = str(result)
+        else:
+            users.append(build(result))
+    return {"users": users, "not_found": not_found, "errors": errors}
+
+@tool(
+    name="moderate_message",
+    description="Delete a message and optionally timeout the user",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "channel_id": {
+                "type": "string",
+                "description": "Channel ID containing the message"
+            },
+            "message_id": {
+                "type": "string",
+                "description": "ID of message to moderate"
+            },
+            "reason": {
+                "type": "string",
+                "description": "Reason for moderation"
+            },
+            "timeout_minutes": {
+                "type": "number",
+                "description": "Optional timeout duration in minutes",
+                "minimum": 0,
+                "maximum": 40320  # Max 4 weeks
             }
-            if isinstance(channel, discord.TextChannel):
-                info["topic"] = channel.topic
-            return [TextContent(type="text", text=f"Channel Information:\n" + "\n".join(f"{k}: {v}" for k, v in info.items()))]
-
-        elif name == "edit_channel":
-            channel = await discord_client.fetch_channel(int(arguments["channel_id"]))
-            edit_args = {}
-            if "name" in arguments:
-                edit_args["name"] = arguments["name"]
-            if "topic" in arguments and isinstance(channel, discord.TextChannel):
-                edit_args["topic"] = arguments["topic"]
-            if "position" in arguments:
-                edit_args["position"] = arguments["position"]
-            if "category_id" in arguments:
-                category = channel.guild.get_channel(int(arguments["category_id"]))
-                if category and isinstance(category, discord.CategoryChannel):
-                    edit_args["category"] = category
-            await channel.edit(**edit_args, reason=arguments.get("reason", "Channel edited via MCP"))
-            return [TextContent(type="text", text=f"Channel #{channel.name} (ID: {channel.id}) edited successfully.")]
-
-        elif name == "add_role":
-            guild = await discord_client.fetch_guild(int(arguments["server_id"]))
-            member = await guild.fetch_member(int(arguments["user_id"]))
-            role = guild.get_role(int(arguments["role_id"]))
-            if not role:
-                return [TextContent(type="text", text=f"Role with ID {arguments['role_id']} not found.")]
-            await member.add_roles(role, reason="Role added via MCP")
-            return [TextContent(type="text", text=f"Added role {role.name} to user {member.name}")]
-
-        elif name == "remove_role":
-            guild = await discord_client.fetch_guild(int(arguments["server_id"]))
-            member = await guild.fetch_member(int(arguments["user_id"]))
-            role = guild.get_role(int(arguments["role_id"]))
-            if not role:
-                return [TextContent(type="text", text=f"Role with ID {arguments['role_id']} not found.")]
-            await member.remove_roles(role, reason="Role removed via MCP")
-            return [TextContent(type="text", text=f"Removed role {role.name} from user {member.name}")]
-
-        elif name == "list_roles":
-            guild = await discord_client.fetch_guild(int(arguments["server_id"]))
-            roles = [
-                {"name": role.name, "id": str(role.id), "color": str(role.color)}
-                for role in guild.roles if not role.is_default()  # Exclude @everyone
-            ]
-            role_list_str = "\n".join([f"- {r['name']} (ID: {r['id']}, Color: {r['color']})" for r in roles])
-            return [TextContent(type="text", text=f"Roles ({len(roles)}):\n{role_list_str}")]
-
-        elif name == "create_role":
-            guild = await discord_client.fetch_guild(int(arguments["server_id"]))
-            role_args = {"name": arguments["name"]}
-            if "color" in arguments:
-                try:
-                    role_args["color"] = discord.Color(int(arguments["color"].lstrip('#'), 16))
-                except ValueError:
-                    return [TextContent(type="text", text="Invalid color format. Use hex code (e.g., #FF0000).")]
-            new_role = await guild.create_role(**role_args, reason=arguments.get("reason", "Role created via MCP"))
-            return [TextContent(type="text", text=f"Created role '{new_role.name}' (ID: {new_role.id})")]
-
-        elif name == "delete_role":
-            guild = await discord_client.fetch_guild(int(arguments["server_id"]))
-            role = guild.get_role(int(arguments["role_id"]))
-            if not role:
-                return [TextContent(type="text", text=f"Role with ID {arguments['role_id']} not found.")]
-            await role.delete(reason=arguments.get("reason", "Role deleted via MCP"))
-            return [TextContent(type="text", text=f"Deleted role '{role.name}' (ID: {arguments['role_id']}) successfully.")]
-
-        elif name == "edit_role":
-            guild = await discord_client.fetch_guild(int(arguments["server_id"]))
-            role = guild.get_role(int(arguments["role_id"]))
-            if not role:
-                return [TextContent(type="text", text=f"Role with ID {arguments['role_id']} not found.")]
-            edit_args = {}
-            if "name" in arguments:
-                edit_args["name"] = arguments["name"]
-            if "color" in arguments:
-                try:
-                    edit_args["color"] = discord.Color(int(arguments["color"].lstrip('#'), 16))
-                except ValueError:
-                    return [TextContent(type="text", text="Invalid color format. Use hex code (e.g., #00FF00).")]
-            await role.edit(**edit_args, reason=arguments.get("reason", "Role edited via MCP"))
-            return [TextContent(type="text", text=f"Role '{role.name}' (ID: {role.id}) edited successfully.")]
-
-        elif name == "create_text_channel":
-            guild = await discord_client.fetch_guild(int(arguments["server_id"]))
-            category = None
-            if "category_id" in arguments:
-                category = guild.get_channel(int(arguments["category_id"]))
-            channel = await guild.create_text_channel(
-                name=arguments["name"],
-                category=category,
-                topic=arguments.get("topic"),
-                reason="Channel created via MCP"
-            )
-            return [TextContent(type="text", text=f"Created text channel #{channel.name} (ID: {channel.id})")]
-
-        elif name == "delete_channel":
-            channel = await discord_client.fetch_channel(int(arguments["channel_id"]))
-            await channel.delete(reason=arguments.get("reason", "Channel deleted via MCP"))
-            return [TextContent(type="text", text="Deleted channel successfully")]
-
-        elif name == "create_thread":
-            channel = await discord_client.fetch_channel(int(arguments["channel_id"]))
-            thread_name = arguments["name"]
-            content = arguments.get("content")
-            auto_archive_duration = arguments.get("auto_archive_duration")
-            reason = arguments.get("reason", "Thread created via MCP")
-
-            if "message_id" in arguments:
-                message = await channel.fetch_message(int(arguments["message_id"]))
-                thread = await message.create_thread(
-                    name=thread_name,
-                    auto_archive_duration=auto_archive_duration,
-                    reason=reason
-                )
-            elif isinstance(channel, discord.ForumChannel):
-                if not content:
-                    return [TextContent(type="text", text="Content is required when creating a thread in a forum channel.")]
-                thread = await channel.create_thread(
-                    name=thread_name,
-                    content=content,
-                    auto_archive_duration=auto_archive_duration,
-                    reason=reason
-                )
-            elif isinstance(channel, discord.TextChannel):
-                thread = await channel.create_thread(
-                    name=thread_name,
-                    auto_archive_duration=auto_archive_duration,
-                    reason=reason
-                )
-            else:
-                return [TextContent(type="text", text="Invalid channel type for creating a thread.")]
-            return [TextContent(type="text", text=f"Created thread '{thread.name}' (ID: {thread.id})")]
-
-        elif name == "delete_thread":
-            thread = await discord_client.fetch_channel(int(arguments["thread_id"]))
-            if isinstance(thread, discord.Thread):
-                await thread.delete(reason=arguments.get("reason", "Thread deleted via MCP"))
-                return [TextContent(type="text", text=f"Deleted thread '{thread.name}' (ID: {arguments['thread_id']}).")]
-            return [TextContent(type="text", text=f"Channel ID {arguments['thread_id']} is not a thread.")]
-
-        elif name == "archive_thread":
-            thread = await discord_client.fetch_channel(int(arguments["thread_id"]))
-            if isinstance(thread, discord.Thread):
-                await thread.edit(archived=True, reason=arguments.get("reason", "Thread archived via MCP"))
-                return [TextContent(type="text", text=f"Archived thread '{thread.name}' (ID: {thread.id}).")]
-            return [TextContent(type="text", text=f"Channel ID {arguments['thread_id']} is not a thread.")]
-
-        elif name == "unarchive_thread":
-            thread = await discord_client.fetch_channel(int(arguments["thread_id"]))
-            if isinstance(thread, discord.Thread):
-                await thread.edit(archived=False, reason=arguments.get("reason", "Thread unarchived via MCP"))
-                return [TextContent(type="text", text=f"Unarchived thread '{thread.name}' (ID: {thread.id}).")]
-            return [TextContent(type="text", text=f"Channel ID {arguments['thread_id']} is not a thread.")]
-
-        elif name == "add_reaction":
-            channel = await discord_client.fetch_channel(int(arguments["channel_id"]))
-            message = await channel.fetch_message(int(arguments["message_id"]))
-            await message.add_reaction(arguments["emoji"])
-            return [TextContent(type="text", text=f"Added reaction {arguments['emoji']} to message")]
-
-        elif name == "add_multiple_reactions":
-            channel = await discord_client.fetch_channel(int(arguments["channel_id"]))
-            message = await channel.fetch_message(int(arguments["message_id"]))
-            for emoji in arguments["emojis"]:
-                await message.add_reaction(emoji)
-            return [TextContent(type="text", text=f"Added reactions: {', '.join(arguments['emojis'])} to message")]
-
-        elif name == "remove_reaction":
-            channel = await discord_client.fetch_channel(int(arguments["channel_id"]))
-            message = await channel.fetch_message(int(arguments["message_id"]))
-            await message.remove_reaction(arguments["emoji"], discord_client.user)
-            return [TextContent(type="text", text=f"Removed reaction {arguments['emoji']} from message")]
-
-        # Application Command Handlers
-        elif name == "list_global_commands":
-            commands_data = await discord_client.http.get_global_commands()
-            command_list = [f"- {cmd['name']} (ID: {cmd['id']}, Type: {cmd.get('type', 1)})" for cmd in commands_data] # Type 1 is CHAT_INPUT
-            return [TextContent(
-                type="text",
-                text=f"Global Application Commands ({len(command_list)}):\n" + "\n".join(command_list)
-            )]
-
-        elif name == "list_guild_commands":
-            guild_id = int(arguments["server_id"])
-            commands_data = await discord_client.http.get_guild_commands(guild_id)
-            command_list = [f"- {cmd['name']} (ID: {cmd['id']}, Type: {cmd.get('type', 1)})" for cmd in commands_data] # Type 1 is CHAT_INPUT
-            return [TextContent(
-                type="text",
-                text=f"Guild Application Commands for {guild_id} ({len(command_list)}):\n" + "\n".join(command_list)
-            )]
-
-        raise ValueError(f"Unknown tool: {name}")
+        },
+        "required": ["channel_id", "message_id", "reason"]
+    },
+    output_schema=object_schema({"message_id": STRING, "timeout_minutes": {"type": ["number", "null"]}}),
+    render=lambda r: (
+        f"Message deleted and user timed out for {r['timeout_minutes']} minutes."
+        if r["timeout_minutes"] else "Message deleted successfully."
+    )
+)
+async def handle_moderate_message(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    channel = await resolver.channel(int(arguments["channel_id"]))
+    message = await resolver.message(channel, int(arguments["message_id"]))
+    await message.delete(reason=arguments.get("reason", "Message deleted via MCP"))
+    if "timeout_minutes" in arguments and arguments["timeout_minutes"] > 0:
+        if isinstance(message.author, discord.Member):
+            duration = discord.utils.utcnow() + timedelta(minutes=arguments["timeout_minutes"])
+            await message.author.timeout(duration, reason=arguments["reason"])
+            return {"message_id": str(message.id), "timeout_minutes": arguments["timeout_minutes"]}
+    return {"message_id": str(message.id), "timeout_minutes": None}
+
+# Application Command Tools
+@tool(
+    name="list_global_commands",
+    description="List all global application commands registered for the bot.",
+    input_schema={"type": "object", "properties": {}}, # No input needed
+    output_schema=COMMANDS_SCHEMA,
+    render=lambda result: f"Global Application Commands ({len(result['commands'])}):\n" + _render_commands(result)
+)
+async def handle_list_global_commands(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    return {"commands": _command_list(await discord_client.http.get_global_commands())}
+
+def _command_list(commands_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{"id": str(cmd["id"]), "name": cmd["name"], "type": cmd.get("type", 1)} for cmd in commands_data] # Type 1 is CHAT_INPUT
+
+def _render_commands(result: Dict[str, Any]) -> str:
+    return "\n".join(f"- {cmd['name']} (ID: {cmd['id']}, Type: {cmd['type']})" for cmd in result["commands"])
+
+@tool(
+    name="list_guild_commands",
+    description="List all application commands registered for the bot in a specific guild.",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "server_id": {
+                "type": "string",
+                "description": "Discord server (guild) ID to list commands for."
+            }
+        },
+        "required": ["server_id"]
+    },
+    output_schema=object_schema({"guild_id": STRING, **COMMANDS_SCHEMA["properties"]}),
+    render=lambda result: (
+        f"Guild Application Commands for {result['guild_id']} ({len(result['commands'])}):\n" + _render_commands(result)
+    )
+)
+async def handle_list_guild_commands(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    guild_id = int(arguments["server_id"])
+    return {"guild_id": str(guild_id), "commands": _command_list(await discord_client.http.get_guild_commands(guild_id))}
+
+@app.list_tools()
+async def list_tools() -> ListToolsResult:
+    """List available Discord tools."""
+    return get_tool_listing()
+
+@app.call_tool()
+async def call_tool(name: str, arguments: Any) -> CallToolResult:
+    """Handle Discord tool calls with error handling."""
+    spec = TOOL_REGISTRY.get(name) if tool_enabled(name) else None
+    # Unknown tools fail at once instead of holding a startup waiter slot
+    if spec is not None and spec.meta.get("requires_ready", True):
+        await readiness.wait()
+    try:
+        if spec is None:
+            raise ValueError(f"Unknown tool: {name}")
+        result = await spec.handler(arguments)
+        fields = budget = None
+        if "records" in spec.meta:
+            records = spec.meta["records"]
+            fields, budget = _requested_fields(arguments), _budget_chars(arguments)
+            if fields is not None:
+                # Most record handlers build only the requested fields; trim the rest here
+                result = {**result, records: _project(result[records], fields)}
+            if budget is not None:
+                result = _fit_budget(name, records, result, budget, fields)
+        return CallToolResult(content=spec.content(result, projected=fields is not None), structuredContent=result)
 
     except discord.Forbidden:
-        return [TextContent(type="text", text="Bot lacks permission to perform this action. Please check its roles and permissions in the server.")]
+        return _error_result("Bot lacks permission to perform this action. Please check its roles and permissions in the server.")
     except discord.NotFound:
-        return [TextContent(type="text", text="Resource not found. Please check the provided IDs (e.g., server_id, channel_id, user_id).")]
+        return _error_result("Resource not found. Please check the provided IDs (e.g., server_id, channel_id, user_id).")
     except ValueError as ve:
-        return [TextContent(type="text", text=f"Value error: {str(ve)}")]
+        return _error_result(f"Value error: {str(ve)}")
     except Exception as e:
         logger.error(f"Error in tool {name}: {str(e)}")
-        return [TextContent(type="text", text=f"An unexpected error occurred: {str(e)}")]
+        return _error_result(f"An unexpected error occurred: {str(e)}")
+
+def _error_result(text: str) -> CallToolResult:
+    return CallToolResult(content=[TextContent(type="text", text=text)], isError=True)
+
+def required_intents() -> List[str]:
+    """Intents the enabled tools and the message store need, for the ``auto`` profile."""
+    names = {intent for spec in enabled_tools() for intent in spec.meta.get("intents", ())}
+    if message_store is not None:
+        # The archive is kept current from message and reaction events
+        names.update(("guild_messages", "guild_reactions", "message_content"))
+    return sorted(names)
+
+def create_bot() -> Union[commands.Bot, commands.AutoShardedBot]:
+    """Build the Discord client from the gateway config and attach the gateway handlers."""
+    global bot, resolver, shard_stats
+    gateway_config.resolve(required_intents())
+    if MEMBER_CACHE == "compact":
+        gateway_config.member_cache_flags = discord.MemberCacheFlags.none()
+        # Guilds are chunked by _index_guild_members without caching members
+        gateway_config.chunk_guilds_at_startup = False
+    bot_class = commands.AutoShardedBot if gateway_config.sharded else commands.Bot
+    bot = bot_class(command_prefix="!", http_trace=rate_limiter.trace_config(), **gateway_config.client_options())
+    rate_limiter.install(bot.http)
+    for func in _client_events:
+        bot.event(func)
+    for func in _client_listeners:
+        bot.add_listener(func)
+    _install_raw_member_updates()
+    # Serve channel/guild/member lookups from the gateway cache where possible
+    resolver = EntityResolver(bot, user_ttl=float(os.getenv("DISCORD_USER_CACHE_TTL", "3600")))
+    shard_stats = ShardStats(bot)
+    logger.info(f"Gateway config: {gateway_config.snapshot()}")
+    return bot
+
+create_bot()
+
+def _on_bot_stopped(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        readiness.fail(task.exception())
+
+# "stdio" serves the one client that spawned the process; "http" serves any
+# number of concurrent sessions (streamable HTTP and SSE) from one bot
+TRANSPORT = os.getenv("DISCORD_MCP_TRANSPORT", "stdio").lower()
+if TRANSPORT not in ("stdio", "http"):
+    raise ValueError(f"DISCORD_MCP_TRANSPORT must be 'stdio' or 'http', not {TRANSPORT!r}")
 
 async def main():
+    # Build the tool list before serving so the first tools/list is as cheap as the rest
+    get_tool_listing()
+
     # Start Discord bot in the background
-    asyncio.create_task(bot.start(DISCORD_TOKEN))
+    bot_task = asyncio.create_task(bot.start(DISCORD_TOKEN))
+    bot_task.add_done_callback(_on_bot_stopped)
 
     # Run MCP server
+    if TRANSPORT == "http":
+        await serve_http(
+            app,
+            host=os.getenv("DISCORD_MCP_HOST", "127.0.0.1"),
+            port=int(os.getenv("DISCORD_MCP_PORT", "8000")),
+            auth_token=os.getenv("DISCORD_MCP_HTTP_TOKEN") or None,
+        )
+        return
     async with stdio_server() as (read_stream, write_stream):
         await app.run(
             read_stream,
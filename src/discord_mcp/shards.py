@@ -0,0 +1,75 @@
+"""Per-shard gateway latency and event-rate statistics."""
+
+import asyncio
+import logging
+import math
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import discord
+
+logger = logging.getLogger("discord-mcp-server")
+
+def shard_for(guild_id: int, shard_count: int) -> int:
+    """The shard Discord delivers ``guild_id``'s events on."""
+    return (guild_id >> 22) % shard_count
+
+class ShardStats:
+    """Estimate each shard's gateway event rate by sampling its sequence number.
+
+    A websocket's ``sequence`` counts the dispatch events of its current
+    session and restarts when the shard opens a new session, so sampling it
+    every ``interval`` seconds costs nothing per event. A single-shard client
+    is reported as one shard.
+    """
+
+    def __init__(self, client: discord.Client, interval: float = 10.0):
+        self.client = client
+        self.interval = interval
+        self.events: Counter = Counter()
+        self.rates: Dict[int, float] = {}
+        self._samples: Dict[int, Tuple[float, int]] = {}
+
+    def websockets(self) -> Dict[int, Any]:
+        """Shard ID -> its current websocket (None before it connects)."""
+        if isinstance(self.client, discord.AutoShardedClient):
+            return {shard_id: info._parent.ws for shard_id, info in self.client.shards.items()}
+        return {self.client.shard_id or 0: self.client.ws}
+
+    def sample(self) -> None:
+        now = time.monotonic()
+        for shard_id, ws in self.websockets().items():
+            sequence = (ws.sequence or 0) if ws is not None else 0
+            previous = self._samples.get(shard_id)
+            if previous is not None:
+                at, last_sequence = previous
+                # A smaller sequence means a new session started counting from zero
+                events = sequence - last_sequence if sequence >= last_sequence else sequence
+                self.events[shard_id] += events
+                self.rates[shard_id] = events / (now - at) if now > at else 0.0
+            self._samples[shard_id] = (now, sequence)
+
+    async def run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def _latency_ms(self, ws: Any) -> Optional[float]:
+        if ws is None or not math.isfinite(ws.latency):
+            return None
+        return round(ws.latency * 1000, 1)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        guilds = Counter(guild.shard_id for guild in self.client.guilds)
+        return [
+            {
+                "id": shard_id,
+                "latency_ms": self._latency_ms(ws),
+                "guilds": guilds[shard_id],
+                "events": self.events[shard_id],
+                "events_per_second": round(self.rates.get(shard_id, 0.0), 2),
+                "connected": ws is not None and ws.open,
+            }
+            for shard_id, ws in sorted(self.websockets().items())
+        ]
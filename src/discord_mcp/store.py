@@ -0,0 +1,428 @@
+"""Optional SQLite archive of channel history, kept current by incremental sync."""
+
+import json
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import discord
+
+logger = logging.getLogger("discord-mcp-server")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    guild_id INTEGER,
+    author_id INTEGER NOT NULL,
+    author TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    reactions TEXT NOT NULL DEFAULT '[]',
+    attachments INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS messages_by_channel ON messages (channel_id, id);
+CREATE TABLE IF NOT EXISTS channel_sync (
+    channel_id INTEGER PRIMARY KEY,
+    oldest_id INTEGER NOT NULL,
+    newest_id INTEGER NOT NULL,
+    reached_start INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL NOT NULL
+);
+"""
+
+# Full-text index over message content, kept in step with the messages table
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+# Messages written per transaction while syncing
+SYNC_BATCH = 100
+
+# Most messages a channel catches up on when it goes live again; a longer
+# gap is not downloaded, the channel is reseeded from its newest messages
+CATCH_UP_LIMIT = 1000
+
+MessageRow = Tuple[int, int, Optional[int], int, str, str, str, str, int]
+
+def message_row(message: discord.Message) -> MessageRow:
+    reactions = [{"emoji": str(r.emoji), "count": r.count} for r in message.reactions]
+    return (
+        message.id,
+        message.channel.id,
+        message.guild.id if message.guild else None,
+        message.author.id,
+        str(message.author),
+        message.content,
+        message.created_at.isoformat(),
+        json.dumps(reactions),
+        len(message.attachments),
+    )
+
+# Record attributes built from an (id, author, content, created_at, reactions) row
+ROW_FIELDS = {
+    "id": lambda row: str(row[0]),
+    "author": lambda row: row[1],
+    "content": lambda row: row[2],
+    "timestamp": lambda row: row[3],
+    "reactions": lambda row: json.loads(row[4]),
+}
+
+class Coverage:
+    """The contiguous span of a channel's history held in the store.
+
+    Every message with ``oldest_id <= id <= newest_id`` is stored;
+    ``reached_start`` means nothing older exists in the channel.
+    """
+
+    __slots__ = ("oldest_id", "newest_id", "reached_start")
+
+    def __init__(self, oldest_id: int, newest_id: int, reached_start: bool):
+        self.oldest_id = oldest_id
+        self.newest_id = newest_id
+        self.reached_start = reached_start
+
+async def _newer_than(history: Any, newest_id: int) -> Any:
+    """The messages of newest-first ``history`` until one at or below ``newest_id``."""
+    async for message in history:
+        if message.id <= newest_id:
+            break
+        yield message
+
+class MessageStore:
+    """Local message archive in SQLite (WAL mode).
+
+    Each channel's coverage grows from the newest messages backwards on
+    demand and forwards by syncing down to the newest stored ID. Once a channel has been synced during the current gateway
+    session it is "live": gateway events keep it current, so reads are
+    answered locally without touching REST. Live state is dropped whenever
+    the gateway disconnects, because events may have been missed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.searchable = self._init_fts()
+        self._live: Set[int] = set()
+        self.local_reads = 0
+        self.synced_messages = 0
+        logger.info(f"Message store opened at {path}")
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _init_fts(self) -> bool:
+        existed = self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+        ).fetchone() is not None
+        try:
+            self.db.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite FTS5 unavailable, message search disabled: {e}")
+            return False
+        if not existed:
+            # Index messages archived before the search index existed
+            self.db.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+        return True
+
+    @contextmanager
+    def _transaction(self):
+        # The connection runs in autocommit mode; batch writes share one commit
+        self.db.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    # --- Writes -----------------------------------------------------------
+
+    def upsert(self, rows: Iterable[MessageRow]) -> None:
+        with self._transaction():
+            # An upsert rather than INSERT OR REPLACE, so the FTS triggers see an update
+            self.db.executemany(
+                "INSERT INTO messages "
+                "(id, channel_id, guild_id, author_id, author, content, created_at, reactions, attachments) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET content = excluded.content, author = excluded.author, "
+                "reactions = excluded.reactions, attachments = excluded.attachments",
+                rows,
+            )
+
+    def delete(self, message_ids: Iterable[int]) -> None:
+        with self._transaction():
+            self.db.executemany("DELETE FROM messages WHERE id = ?", ((i,) for i in message_ids))
+
+    def update_content(self, message_id: int, content: str) -> None:
+        self.db.execute("UPDATE messages SET content = ? WHERE id = ?", (content, message_id))
+
+    def _rewrite_reactions(self, message_id: int, rewrite: Any) -> None:
+        row = self.db.execute("SELECT reactions FROM messages WHERE id = ?", (message_id,)).fetchone()
+        if row is None:
+            return
+        reactions = [r for r in rewrite(json.loads(row[0])) if r["count"] > 0]
+        self.db.execute("UPDATE messages SET reactions = ? WHERE id = ?", (json.dumps(reactions), message_id))
+
+    def adjust_reaction(self, message_id: int, emoji: str, delta: int) -> None:
+        def rewrite(reactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            for reaction in reactions:
+                if reaction["emoji"] == emoji:
+                    reaction["count"] += delta
+                    return reactions
+            return reactions + [{"emoji": emoji, "count": delta}]
+        self._rewrite_reactions(message_id, rewrite)
+
+    def clear_reactions(self, message_id: int, emoji: Optional[str] = None) -> None:
+        self._rewrite_reactions(message_id, lambda reactions: [r for r in reactions if emoji is not None and r["emoji"] != emoji])
+
+    # --- Gateway events ---------------------------------------------------
+
+    def on_message(self, message: discord.Message) -> None:
+        self.upsert([message_row(message)])
+        if message.channel.id in self._live:
+            self._extend_newest(message.channel.id, message.id)
+
+    def on_disconnect(self) -> None:
+        self._live.clear()
+
+    # --- Coverage ---------------------------------------------------------
+
+    def is_live(self, channel_id: int) -> bool:
+        return channel_id in self._live
+
+    def coverage(self, channel_id: int) -> Optional[Coverage]:
+        row = self.db.execute(
+            "SELECT oldest_id, newest_id, reached_start FROM channel_sync WHERE channel_id = ?",
+            (channel_id,),
+        ).fetchone()
+        return Coverage(row[0], row[1], bool(row[2])) if row else None
+
+    # Coverage only grows, except when a catch-up gap is too long and the
+    # span restarts at the newest messages. Syncs, backfills and gateway
+    # events run concurrently, so each widens its own end of the span in SQL
+    # rather than writing back a Coverage read before an await.
+
+    def _save_coverage(self, channel_id: int, coverage: Coverage) -> None:
+        self.db.execute(
+            "INSERT INTO channel_sync (channel_id, oldest_id, newest_id, reached_start, synced_at) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (channel_id) DO UPDATE SET oldest_id = MIN(oldest_id, excluded.oldest_id), "
+            "newest_id = MAX(newest_id, excluded.newest_id), "
+            "reached_start = MAX(reached_start, excluded.reached_start), synced_at = excluded.synced_at",
+            (channel_id, coverage.oldest_id, coverage.newest_id, int(coverage.reached_start), time.time()),
+        )
+
+    def _reset_coverage(self, channel_id: int, coverage: Coverage) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO channel_sync (channel_id, oldest_id, newest_id, reached_start, synced_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (channel_id, coverage.oldest_id, coverage.newest_id, int(coverage.reached_start), time.time()),
+        )
+
+    def _extend_newest(self, channel_id: int, newest_id: int) -> None:
+        self.db.execute(
+            "UPDATE channel_sync SET newest_id = MAX(newest_id, ?), synced_at = ? WHERE channel_id = ?",
+            (newest_id, time.time(), channel_id),
+        )
+
+    def _extend_oldest(self, channel_id: int, start_id: int, oldest_id: int, reached_start: bool) -> None:
+        """Widen coverage down to ``oldest_id`` from a backfill that began at ``start_id``.
+
+        Skipped if the span was reset above ``start_id`` meanwhile, since the
+        backfilled messages no longer join it.
+        """
+        self.db.execute(
+            "UPDATE channel_sync SET oldest_id = MIN(oldest_id, ?), reached_start = MAX(reached_start, ?) "
+            "WHERE channel_id = ? AND oldest_id <= ?",
+            (oldest_id, int(reached_start), channel_id, start_id),
+        )
+
+    def count(self, channel_id: int, low: int, high: int) -> int:
+        """Stored messages with ``low <= id < high``."""
+        return self.db.execute(
+            "SELECT COUNT(*) FROM messages WHERE channel_id = ? AND id >= ? AND id < ?",
+            (channel_id, low, high),
+        ).fetchone()[0]
+
+    # --- Sync -------------------------------------------------------------
+
+    async def _download(self, history: Any) -> Tuple[int, Optional[int], Optional[int]]:
+        """Store everything ``history`` yields; returns (count, lowest id, highest id)."""
+        batch: List[MessageRow] = []
+        count = 0
+        low = high = None
+        async for message in history:
+            batch.append(message_row(message))
+            count += 1
+            low = message.id if low is None else min(low, message.id)
+            high = message.id if high is None else max(high, message.id)
+            if len(batch) == SYNC_BATCH:
+                self.upsert(batch)
+                batch = []
+        if batch:
+            self.upsert(batch)
+        self.synced_messages += count
+        return count, low, high
+
+    async def sync(self, channel: Any, seed: int) -> Coverage:
+        """Bring ``channel`` up to date, seeding it with ``seed`` messages if new to the store."""
+        coverage = self.coverage(channel.id)
+        if channel.id in self._live and coverage is not None:
+            return coverage
+        if coverage is None:
+            count, low, high = await self._download(channel.history(limit=seed))
+            self._save_coverage(channel.id, Coverage(low or 0, high or 0, count < seed))
+        else:
+            count, low, high = await self._download(
+                _newer_than(channel.history(limit=CATCH_UP_LIMIT), coverage.newest_id)
+            )
+            if count >= CATCH_UP_LIMIT:
+                # The gap may be longer than the catch-up; restart coverage past it
+                logger.info(f"Channel {channel.id} missed {count}+ messages, reseeding its coverage")
+                self._reset_coverage(channel.id, Coverage(low, high, False))
+            elif high is not None:
+                self._extend_newest(channel.id, high)
+        self._live.add(channel.id)
+        return self.coverage(channel.id)
+
+    async def backfill(self, channel: Any, coverage: Coverage, needed: int) -> None:
+        """Extend coverage ``needed`` messages further into the past."""
+        if coverage.reached_start or needed <= 0:
+            return
+        count, low, _ = await self._download(
+            channel.history(limit=needed, before=discord.Object(coverage.oldest_id))
+        )
+        self._extend_oldest(channel.id, coverage.oldest_id, coverage.oldest_id if low is None else low, count < needed)
+        stored = self.coverage(channel.id)
+        coverage.oldest_id, coverage.reached_start = stored.oldest_id, stored.reached_start
+
+    # --- Reads ------------------------------------------------------------
+
+    def _records(self, rows: List[tuple], fields: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        """Message records from ``rows``, with only ``fields`` when given (reactions JSON is parsed only if asked for)."""
+        self.local_reads += 1
+        selected = [(key, build) for key, build in ROW_FIELDS.items() if fields is None or key in fields]
+        return [{key: build(row) for key, build in selected} for row in rows]
+
+    async def read_before(self, channel: Any, before: Optional[int], limit: int, fields: Optional[Set[str]] = None) -> Optional[List[Dict[str, Any]]]:
+        """Newest-first messages older than ``before``, or None if outside stored coverage."""
+        if before is not None and self.coverage(channel.id) is None:
+            # Seeding stores the newest messages, which would not reach the cursor
+            return None
+        coverage = await self.sync(channel, limit)
+        upper = coverage.newest_id + 1 if before is None else before
+        if upper < coverage.oldest_id and not coverage.reached_start:
+            return None
+        have = self.count(channel.id, coverage.oldest_id, upper)
+        if have < limit:
+            await self.backfill(channel, coverage, limit - have)
+        rows = self.db.execute(
+            "SELECT id, author, content, created_at, reactions FROM messages "
+            "WHERE channel_id = ? AND id >= ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (channel.id, coverage.oldest_id, upper, limit),
+        ).fetchall()
+        return self._records(rows, fields)
+
+    async def read_after(self, channel: Any, after: int, limit: int, fields: Optional[Set[str]] = None) -> Optional[List[Dict[str, Any]]]:
+        """Oldest-first messages newer than ``after``, or None if outside stored coverage."""
+        if self.coverage(channel.id) is None:
+            return None
+        coverage = await self.sync(channel, limit)
+        if after < coverage.oldest_id and not coverage.reached_start:
+            return None
+        rows = self.db.execute(
+            "SELECT id, author, content, created_at, reactions FROM messages "
+            "WHERE channel_id = ? AND id > ? AND id <= ? ORDER BY id ASC LIMIT ?",
+            (channel.id, after, coverage.newest_id, limit),
+        ).fetchall()
+        return self._records(rows, fields)
+
+    def search(
+        self,
+        query: str,
+        *,
+        guild_id: Optional[int] = None,
+        channel_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        after: Optional[datetime] = None,
+        before: Optional[datetime] = None,
+        has_attachments: Optional[bool] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """Rank stored messages matching every term of ``query``; returns (page, has_more)."""
+        terms = query.split()
+        if not terms:
+            raise ValueError("Search query must contain at least one term")
+        # Quote each term so user text is never parsed as FTS5 query syntax
+        match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        clauses = ["messages_fts MATCH ?"]
+        params: List[Any] = [match]
+        if guild_id is not None:
+            clauses.append("m.guild_id = ?")
+            params.append(guild_id)
+        if channel_id is not None:
+            clauses.append("m.channel_id = ?")
+            params.append(channel_id)
+        if author_id is not None:
+            clauses.append("m.author_id = ?")
+            params.append(author_id)
+        # Snowflake IDs encode creation time, so time bounds become ID bounds
+        if after is not None:
+            clauses.append("m.id >= ?")
+            params.append(discord.utils.time_snowflake(after, high=False))
+        if before is not None:
+            clauses.append("m.id < ?")
+            params.append(discord.utils.time_snowflake(before, high=False))
+        if has_attachments is not None:
+            clauses.append("m.attachments > 0" if has_attachments else "m.attachments = 0")
+        rows = self.db.execute(
+            "SELECT m.id, m.channel_id, m.author, m.created_at, m.attachments, "
+            "snippet(messages_fts, 0, '**', '**', '...', 24) "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            f"WHERE {' AND '.join(clauses)} "
+            "ORDER BY bm25(messages_fts), m.id DESC LIMIT ? OFFSET ?",
+            (*params, limit + 1, offset),
+        ).fetchall()
+        self.local_reads += 1
+        page = [
+            {
+                "id": str(row[0]),
+                "channel_id": str(row[1]),
+                "author": row[2],
+                "timestamp": row[3],
+                "attachments": row[4],
+                "snippet": row[5],
+            }
+            for row in rows[:limit]
+        ]
+        return page, len(rows) > limit
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "messages": self.db.execute("SELECT COUNT(*) FROM messages").fetchone()[0],
+            "channels": self.db.execute("SELECT COUNT(*) FROM channel_sync").fetchone()[0],
+            "live_channels": len(self._live),
+            "local_reads": self.local_reads,
+            "synced_messages": self.synced_messages,
+        }
@@ -0,0 +1,109 @@
+"""Per-guild structure versions, so channel and role lists can be served as deltas."""
+
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("discord-mcp-server")
+
+# Entity kinds whose changes are versioned
+KINDS = ("channels", "roles")
+
+class GuildStructure:
+    """Change log of one guild's channels and roles since tracking began.
+
+    ``version`` increases by one with every create, update or delete event.
+    It starts at the wall-clock time in microseconds, so versions handed out
+    by an earlier process (or before the guild was last reset) are below
+    ``floor`` and answered with a full list rather than a wrong delta.
+    Entities absent from ``changed`` have not changed since ``floor``.
+    """
+
+    __slots__ = ("version", "floor", "changed", "removed")
+
+    def __init__(self) -> None:
+        self.version = self.floor = time.time_ns() // 1000
+        self.changed: Dict[str, Dict[int, int]] = {kind: {} for kind in KINDS}
+        self.removed: Dict[str, Dict[int, int]] = {kind: {} for kind in KINDS}
+
+    def bump(self, kind: str, entity_id: int, removed: bool = False, max_removed: int = 1000) -> None:
+        self.version += 1
+        if removed:
+            self.changed[kind].pop(entity_id, None)
+            tombstones = self.removed[kind]
+            tombstones[entity_id] = self.version
+            if len(tombstones) > max_removed:
+                # Forget the oldest deletion; deltas from before it can no longer be answered
+                oldest = next(iter(tombstones))
+                self.floor = max(self.floor, tombstones.pop(oldest))
+        else:
+            self.removed[kind].pop(entity_id, None)
+            self.changed[kind][entity_id] = self.version
+
+    def covers(self, since_version: int) -> bool:
+        """Whether the changes after ``since_version`` are all known."""
+        return self.floor <= since_version <= self.version
+
+    def changes(self, kind: str, since_version: int) -> Tuple[Set[int], List[int]]:
+        """IDs added or changed, and IDs removed, after ``since_version``."""
+        changed = {entity_id for entity_id, version in self.changed[kind].items() if version > since_version}
+        removed = [entity_id for entity_id, version in self.removed[kind].items() if version > since_version]
+        return changed, removed
+
+class StructureVersions:
+    """Structure versions for the guilds whose channels or roles have been listed.
+
+    Guilds are tracked from their first listing; events for other guilds
+    cost nothing. :meth:`reset` forgets every guild, for when the gateway
+    session was replaced and events may have been missed.
+    """
+
+    def __init__(self, max_removed: int = 1000):
+        self.max_removed = max_removed
+        self.guilds: Dict[int, GuildStructure] = {}
+        self.deltas = 0
+        self.full_lists = 0
+
+    def track(self, guild_id: int) -> GuildStructure:
+        structure = self.guilds.get(guild_id)
+        if structure is None:
+            structure = self.guilds[guild_id] = GuildStructure()
+        return structure
+
+    def changed(self, kind: str, guild_id: int, entity_id: int) -> None:
+        structure = self.guilds.get(guild_id)
+        if structure is not None:
+            structure.bump(kind, entity_id, max_removed=self.max_removed)
+
+    def removed(self, kind: str, guild_id: int, entity_id: int) -> None:
+        structure = self.guilds.get(guild_id)
+        if structure is not None:
+            structure.bump(kind, entity_id, removed=True, max_removed=self.max_removed)
+
+    def drop(self, guild_id: int) -> None:
+        self.guilds.pop(guild_id, None)
+
+    def reset(self, predicate: Optional[Callable[[int], bool]] = None) -> None:
+        """Forget the guilds matching ``predicate`` (all of them by default)."""
+        guild_ids = [guild_id for guild_id in self.guilds if predicate is None or predicate(guild_id)]
+        if guild_ids:
+            logger.info(f"Resetting structure versions for {len(guild_ids)} guilds")
+        for guild_id in guild_ids:
+            del self.guilds[guild_id]
+
+    def delta(self, kind: str, guild_id: int, since_version: Optional[int]) -> Tuple[int, Optional[Tuple[Set[int], List[int]]]]:
+        """The guild's current version and its changes since ``since_version``.
+
+        The changes are None when a full list must be sent instead: no
+        ``since_version`` was given, or it is older than the guild's known
+        history.
+        """
+        structure = self.track(guild_id)
+        if since_version is None or not structure.covers(since_version):
+            self.full_lists += 1
+            return structure.version, None
+        self.deltas += 1
+        return structure.version, structure.changes(kind, since_version)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"guilds": len(self.guilds), "deltas": self.deltas, "full_lists": self.full_lists}
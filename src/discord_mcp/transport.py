@@ -0,0 +1,96 @@
+"""HTTP transport: many MCP sessions served by one process and one Discord client."""
+
+import contextlib
+import hmac
+import logging
+from typing import AsyncIterator, Optional
+
+import uvicorn
+from mcp.server import Server
+from mcp.server.sse import SseServerTransport
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from mcp.server.transport_security import TransportSecuritySettings
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Mount, Route
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger("discord-mcp-server")
+
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+class _SessionEndpoint:
+    """ASGI endpoint handing streamable HTTP requests to the session manager."""
+
+    def __init__(self, manager: StreamableHTTPSessionManager):
+        self.manager = manager
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.manager.handle_request(scope, receive, send)
+
+class BearerAuth:
+    """Reject HTTP requests without ``Authorization: Bearer <token>``."""
+
+    def __init__(self, app: ASGIApp, token: str):
+        self.app = app
+        self.expected = f"Bearer {token}".encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = dict(scope["headers"])
+            if not hmac.compare_digest(headers.get(b"authorization", b""), self.expected):
+                await PlainTextResponse("Unauthorized", status_code=401)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+def security_settings(host: str, port: int) -> Optional[TransportSecuritySettings]:
+    """DNS rebinding protection when bound to loopback, where browsers are the threat."""
+    if host not in LOOPBACK_HOSTS:
+        return None
+    hosts = [f"{name}:{port}" for name in ("127.0.0.1", "localhost", "[::1]")]
+    return TransportSecuritySettings(
+        enable_dns_rebinding_protection=True,
+        allowed_hosts=hosts,
+        allowed_origins=[f"http://{h}" for h in hosts],
+    )
+
+def http_app(app: Server, host: str, port: int, auth_token: Optional[str] = None) -> ASGIApp:
+    """Starlette app serving ``app`` over streamable HTTP at ``/mcp`` and SSE at ``/sse``.
+
+    Each client connection gets its own MCP session; all of them share the
+    tool handlers, and so the Discord client, caches and rate limiter.
+    """
+    security = security_settings(host, port)
+    manager = StreamableHTTPSessionManager(app=app, security_settings=security)
+    sse = SseServerTransport("/messages/", security_settings=security)
+
+    async def handle_sse(request: Request) -> Response:
+        async with sse.connect_sse(request.scope, request.receive, request._send) as (read_stream, write_stream):
+            await app.run(read_stream, write_stream, app.create_initialization_options())
+        return Response()
+
+    @contextlib.asynccontextmanager
+    async def lifespan(_: Starlette) -> AsyncIterator[None]:
+        async with manager.run():
+            yield
+
+    starlette_app: ASGIApp = Starlette(
+        routes=[
+            Route("/mcp", endpoint=_SessionEndpoint(manager)),
+            Route("/sse", endpoint=handle_sse, methods=["GET"]),
+            Mount("/messages/", app=sse.handle_post_message),
+        ],
+        lifespan=lifespan,
+    )
+    if auth_token:
+        starlette_app = BearerAuth(starlette_app, auth_token)
+    return starlette_app
+
+async def serve_http(app: Server, host: str, port: int, auth_token: Optional[str] = None) -> None:
+    """Serve ``app`` over HTTP until the process is interrupted."""
+    if host not in LOOPBACK_HOSTS and not auth_token:
+        logger.warning(f"HTTP transport listening on {host} without DISCORD_MCP_HTTP_TOKEN; anyone who can reach it can use the bot")
+    config = uvicorn.Config(http_app(app, host, port, auth_token), host=host, port=port, log_level="info")
+    logger.info(f"Serving MCP over HTTP at http://{host}:{port}/mcp (SSE at /sse)")
+    await uvicorn.Server(config).serve()
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import unittest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+# Importing the package loads the server module, which requires a token
+os.environ.setdefault("DISCORD_TOKEN", "test-token")
+
+from discord_mcp import server
+from discord_mcp.members import GuildMembers, MemberIndex, MemberRecord
+
+GUILD_ID = 1
+EVERYONE = SimpleNamespace(id=GUILD_ID)
+
+def member(user_id: int, *role_ids: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=user_id,
+        name=f"user{user_id}",
+        nick=None,
+        global_name=None,
+        joined_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        roles=[EVERYONE, *(SimpleNamespace(id=role_id) for role_id in role_ids)],
+        guild=SimpleNamespace(id=GUILD_ID),
+    )
+
+def update_payload(user_id: int, *role_ids: int) -> dict:
+    return {
+        "guild_id": str(GUILD_ID),
+        "user": {"id": str(user_id), "username": f"user{user_id}"},
+        "roles": [str(role_id) for role_id in role_ids],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+    }
+
+class MemberIndexLoadTest(unittest.TestCase):
+    def test_events_during_chunk_are_replayed(self):
+        index = MemberIndex()
+        pending = index.begin_load(GUILD_ID)
+        chunked = [member(1, 5), member(2), member(3)]
+
+        # Events arrive while the chunk is still downloading
+        index.remove(GUILD_ID, 2)
+        index.apply_raw_update(update_payload(3, 6))
+        index.upsert(member(4, 5))
+
+        guild = index.load(GUILD_ID, chunked, pending)
+        self.assertEqual(sorted(guild.by_id), [1, 3, 4])
+        self.assertEqual(list(guild.by_id[3].roles), [6])
+        self.assertEqual(sorted(guild.role_members[5]), [1, 4])
+        self.assertNotIn(GUILD_ID, index._loading)
+
+    def test_failed_chunk_stops_buffering(self):
+        index = MemberIndex()
+        pending = index.begin_load(GUILD_ID)
+        index.remove(GUILD_ID, 1)
+        index.end_load(GUILD_ID, pending)
+        index.remove(GUILD_ID, 2)
+        self.assertEqual(len(pending), 1)
+        self.assertNotIn(GUILD_ID, index._loading)
+
+    def test_events_for_unloaded_guilds_are_ignored(self):
+        index = MemberIndex()
+        index.remove(GUILD_ID, 1)
+        index.apply_raw_update(update_payload(1))
+        self.assertEqual(index.guilds, {})
+        self.assertEqual(index._loading, {})
+
+class GuildMembersTest(unittest.TestCase):
+    def setUp(self):
+        self.guild = GuildMembers(GUILD_ID, (MemberRecord.from_member(member(i)) for i in range(1, 201)))
+
+    def test_find_starts_at_prefix(self):
+        found = self.guild.find("user19", limit=3)
+        self.assertEqual([(record.id, match) for record, match in found], [(19, "exact"), (190, "prefix"), (191, "prefix")])
+
+    def test_iter_after_starts_past_cursor(self):
+        self.assertEqual([record.id for record in self.guild.iter_after(197)], [198, 199, 200])
+        self.assertEqual([record.id for record in self.guild.query(after=50, limit=2)], [51, 52])
+
+class FakeGuild:
+    """Guild whose chunk delivers ``members`` after running ``during_chunk``."""
+
+    id = GUILD_ID
+
+    def __init__(self, members, during_chunk):
+        self.members = members
+        self.during_chunk = during_chunk
+        self.chunks = 0
+
+    async def chunk(self, cache=True):
+        self.chunks += 1
+        await asyncio.sleep(0)
+        await self.during_chunk()
+        return list(self.members)
+
+class LazyChunkingTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.index = MemberIndex()
+        for patcher in (
+            mock.patch.object(server, "member_index", self.index),
+            mock.patch.object(server, "INDEX_AT_STARTUP", False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_events_during_rechunk_after_eviction_are_kept(self):
+        async def first_chunk():
+            await server.on_raw_member_remove(SimpleNamespace(guild_id=GUILD_ID, user=SimpleNamespace(id=2)))
+
+        guild = FakeGuild([member(1), member(2)], first_chunk)
+        with mock.patch.object(server.bot, "get_guild", lambda guild_id: guild):
+            loaded = await server.guild_member_index(GUILD_ID)
+            self.assertEqual(sorted(loaded.by_id), [1])
+
+            self.assertEqual(self.index.evict_idle(-1), [GUILD_ID])
+
+            async def second_chunk():
+                self.index.apply_raw_update(update_payload(1, 7))
+            guild.members, guild.during_chunk = [member(1), member(3)], second_chunk
+            reloaded = await server.guild_member_index(GUILD_ID)
+
+        self.assertEqual(guild.chunks, 2)
+        self.assertEqual(sorted(reloaded.by_id), [1, 3])
+        self.assertEqual(list(reloaded.by_id[1].roles), [7])
+
+    async def test_new_session_drops_loaded_indexes(self):
+        self.index.load(GUILD_ID, [member(1)], self.index.begin_load(GUILD_ID))
+        with mock.patch.object(server, "MEMBER_INDEX_IDLE_TTL", 0), \
+                mock.patch.object(type(server.bot), "user", SimpleNamespace(name="bot")):
+            await server.on_ready()
+        self.assertEqual(self.index.guilds, {})
+
+if __name__ == "__main__":
+    unittest.main()
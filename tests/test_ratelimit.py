@@ -0,0 +1,58 @@
+import asyncio
+import os
+import time
+import unittest
+
+# Importing the package loads the server module, which requires a token
+os.environ.setdefault("DISCORD_TOKEN", "test-token")
+
+from discord.http import Route
+
+from discord_mcp.ratelimit import RateLimitScheduler
+
+EXHAUSTED = {"X-RateLimit-Limit": "1", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.05"}
+
+class CountingScheduler(RateLimitScheduler):
+    """Scheduler that counts the global tokens it takes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.global_tokens = 0
+
+    async def _acquire_global(self) -> None:
+        self.global_tokens += 1
+        await super()._acquire_global()
+
+def route() -> Route:
+    return Route("GET", "/channels/{channel_id}/messages", channel_id=1)
+
+class RateLimitSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def send(self, scheduler: RateLimitScheduler) -> None:
+        dispatch = await scheduler.acquire(route())
+        scheduler.observe(dispatch, 200, EXHAUSTED)
+        scheduler._release(dispatch)
+
+    async def test_waiting_on_a_bucket_takes_no_global_tokens(self):
+        scheduler = CountingScheduler(global_rate=50)
+        await asyncio.gather(*(self.send(scheduler) for _ in range(6)))
+        self.assertEqual(scheduler.requests, 6)
+        self.assertEqual(scheduler.global_tokens, 6)
+
+    async def test_exhausted_bucket_waits_for_reset(self):
+        scheduler = RateLimitScheduler(global_rate=50)
+        started = time.monotonic()
+        await asyncio.gather(*(self.send(scheduler) for _ in range(4)))
+        # The first request is free; each later one waits out a 0.05s reset
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertEqual(scheduler.delayed, 3)
+
+    async def test_failed_request_returns_its_slot(self):
+        scheduler = RateLimitScheduler(global_rate=50)
+        dispatch = await scheduler.acquire(route())
+        scheduler._release(dispatch)
+        bucket = scheduler.bucket_for(route())
+        self.assertEqual(bucket.in_flight, 0)
+        self.assertEqual(bucket.remaining, 1)
+
+if __name__ == "__main__":
+    unittest.main()
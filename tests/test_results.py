@@ -0,0 +1,25 @@
+import os
+import unittest
+
+# Importing the package loads the server module, which requires a token
+os.environ.setdefault("DISCORD_TOKEN", "test-token")
+
+from discord_mcp import server
+
+class FitBudgetTest(unittest.IsolatedAsyncioTestCase):
+    async def test_page_cursor_comes_with_last_part(self):
+        records = [{"id": str(i), "name": "x" * 40} for i in range(10)]
+        result = server._fit_budget("list_members", "members", {"members": records, "next_after": "9"}, 200)
+        self.assertIsNone(result["next_after"])
+        received = list(result["members"])
+        while "continuation" in result:
+            part = await server.handle_continue_result({"token": result["continuation"]["token"]})
+            result = part["result"]
+            received.extend(result["members"])
+            if "continuation" in result:
+                self.assertIsNone(result["next_after"])
+        self.assertEqual(received, records)
+        self.assertEqual(result["next_after"], "9")
+
+if __name__ == "__main__":
+    unittest.main()
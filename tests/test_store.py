@@ -0,0 +1,114 @@
+import os
+import unittest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+# Importing the package loads the server module, which requires a token
+os.environ.setdefault("DISCORD_TOKEN", "test-token")
+
+from discord_mcp import store
+from discord_mcp.store import MessageStore
+
+CHANNEL_ID = 10
+
+def message(message_id: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=message_id,
+        channel=SimpleNamespace(id=CHANNEL_ID),
+        guild=SimpleNamespace(id=1),
+        author=SimpleNamespace(id=2, name="author"),
+        content=f"message {message_id}",
+        created_at=datetime.now(timezone.utc),
+        reactions=[],
+        attachments=[],
+    )
+
+class FakeChannel:
+    """Channel whose history holds ``ids``; ``during_history`` runs mid-download."""
+
+    id = CHANNEL_ID
+
+    def __init__(self, ids, during_history=None):
+        self.ids = sorted(ids)
+        self.during_history = during_history
+
+    async def history(self, limit=None, before=None, after=None, oldest_first=False):
+        ids = [i for i in self.ids if (before is None or i < before.id) and (after is None or i > after.id)]
+        ids = ids if oldest_first else ids[::-1]
+        for position, message_id in enumerate(ids[:limit]):
+            if position == 1 and self.during_history is not None:
+                hook, self.during_history = self.during_history, None
+                hook()
+            yield message(message_id)
+
+class MessageStoreCoverageTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.store = MessageStore(":memory:")
+
+    def tearDown(self):
+        self.store.close()
+
+    async def test_message_during_backfill_stays_readable(self):
+        channel = FakeChannel(range(1, 301))
+        await self.store.read_before(channel, None, 10)
+
+        # A new message arrives while the next read backfills older history
+        def deliver():
+            channel.ids.append(301)
+            self.store.on_message(message(301))
+        channel.during_history = deliver
+
+        await self.store.read_before(channel, None, 100)
+        self.assertEqual(self.store.coverage(CHANNEL_ID).newest_id, 301)
+        newest = await self.store.read_before(channel, None, 5)
+        self.assertEqual(newest[0]["id"], "301")
+
+    async def test_backfill_reaching_start_is_recorded(self):
+        channel = FakeChannel(range(1, 21))
+        await self.store.read_before(channel, None, 5)
+        records = await self.store.read_before(channel, None, 50)
+        self.assertEqual(len(records), 20)
+        coverage = self.store.coverage(CHANNEL_ID)
+        self.assertEqual((coverage.oldest_id, coverage.newest_id, coverage.reached_start), (1, 20, True))
+
+    async def test_paging_continues_past_oldest_stored(self):
+        channel = FakeChannel(range(1, 301))
+        first = await self.store.read_before(channel, None, 10)
+        self.assertEqual([int(record["id"]) for record in first], list(range(300, 290, -1)))
+        # The next page's cursor is the oldest stored message itself
+        second = await self.store.read_before(channel, 291, 10)
+        self.assertEqual([int(record["id"]) for record in second], list(range(290, 280, -1)))
+
+    async def test_catch_up_extends_coverage(self):
+        channel = FakeChannel(range(1, 101))
+        await self.store.read_before(channel, None, 10)
+        self.store.on_disconnect()
+        channel.ids.extend(range(101, 111))
+        newest = await self.store.read_before(channel, None, 15)
+        self.assertEqual([int(record["id"]) for record in newest], list(range(110, 95, -1)))
+        coverage = self.store.coverage(CHANNEL_ID)
+        self.assertEqual((coverage.oldest_id, coverage.newest_id), (91, 110))
+
+    async def test_long_gap_reseeds_coverage(self):
+        channel = FakeChannel(range(1, 101))
+        await self.store.read_before(channel, None, 10)
+        self.store.on_disconnect()
+        channel.ids.extend(range(101, 201))
+        with mock.patch.object(store, "CATCH_UP_LIMIT", 20):
+            await self.store.sync(channel, 10)
+        coverage = self.store.coverage(CHANNEL_ID)
+        # Messages 101-180 were never downloaded, so coverage must not span them
+        self.assertEqual((coverage.oldest_id, coverage.newest_id, coverage.reached_start), (181, 200, False))
+        older = await self.store.read_before(channel, 181, 5)
+        self.assertEqual([int(record["id"]) for record in older], list(range(180, 175, -1)))
+
+    async def test_cursor_read_of_new_channel_skips_seed(self):
+        channel = FakeChannel(range(1, 301))
+        self.assertIsNone(await self.store.read_before(channel, 50, 10))
+        self.assertIsNone(await self.store.read_after(channel, 50, 10))
+        self.assertIsNone(self.store.coverage(CHANNEL_ID))
+        self.assertEqual(self.store.synced_messages, 0)
+
+if __name__ == "__main__":
+    unittest.main()